@@ -21,8 +21,9 @@ import numpy as np
 from scipy.optimize import curve_fit, minimize
 import matplotlib.pyplot as plt
 from random import seed, randint
-import matplotlib.animation as animation
-from simulacion import Trafico
+from simulacion import Trafico, semilla_punto
+from observables import distancias, distancia_total
+from diagramas import graficar
 
 
 
@@ -97,53 +98,22 @@ for paso in range(N):
     Pos[j,:]=X                          # Guardo las posiciones
     j+=1
 
-x=np.arange(N)
 plt.figure(figsize=(10,10))
-plt.plot(x,Pos,color='grey',marker='.',markersize=0.2, linestyle='')
-plt.xlabel('Tiempo')
-plt.ylabel('Distancia')
+graficar(Pos, M)
 plt.savefig("Simulacion trafico.png",dpi=200)
 plt.show()
 print('Semilla = ', semilla)
 
 """
-# Voy a graficar una animacion de todo esto.
-fig, ax = plt.subplots()
-
-Lista = ['line'+str(i) for i in range(k)]       # los k autos a t=0
-Lineas=[]                                       # guardo los plots de cada auto
-for i in Lista:
-    i, = ax.plot(Pos[0,int(i[-1])],0, '.')
-    Lineas.append(i)
-
-plt.xlim([0,M])                                 # Fijo el ancho del plot a M
-
-
-# Una animacion de cada plot en Lineas
-def animate(i):
-    temp=[]
-    l=0
-    for j in Lineas:
-        j.set_xdata(Pos[i,l])
-        temp.append(j)
-        l+=1
-    return temp
-
-ani = animation.FuncAnimation( fig, animate, frames=N)
-ani.save("movie.mp4", dpi=200)
-plt.close()
+# Voy a graficar una animacion de todo esto: el diagrama espacio-tiempo
+# corriendose, armado con la misma imagen.
+from diagramas import pelicula
+pelicula(Pos, M, "movie.mp4", ventana=200, paso=5)
 """
 
 # Calculo la distancia total recorrida por los autos
-Distancia=0                                     # La distancia total 
-Dist_auto=[]                                    # La recorrida por cada auto
-temp=0
-for i in range(k):
-    temp=0
-    for j in range(N-1):
-        temp+=(Pos[j+1,i]-Pos[j,i])%M
-    Distancia+=temp
-    Dist_auto.append(temp)
+Dist_auto=distancias(Pos, M)                    # La recorrida por cada auto
+Distancia=Dist_auto.sum()                       # La distancia total 
 
 
 print("La distancia total recorrida es ", Distancia, " posiciones.")
@@ -152,9 +122,11 @@ for i in range(k):
     print("Auto ", str(i+1).zfill(len(str(k)))," = ", Dist_auto[i],
           " posiciones.")
 
-# Voy a probar hacerlo desde un modulo, deberia dar lo mismo:
-Pos1=Trafico(M, N, V_max, k, semilla)
-# Perfecto! Funciona
+# Voy a probar hacerlo desde un modulo. No da las mismas posiciones: el modulo
+# usa las reglas de Nagel-Schreckenberg tal cual (la velocidad llega a V_max,
+# aca solo a V_max-1) y frena con un generador de numpy en vez de randint.
+# Pero la dinamica es la misma:
+Pos1=Trafico(M, N, V_max, k, 1/3, semilla)
 
 
 # Aprovechando el modulo, voy a hacer muchas corridas, para
@@ -164,20 +136,11 @@ Pos1=Trafico(M, N, V_max, k, semilla)
 Resultados=[]
 # Hago las simulaciones:
 for k in np.arange(55,505,5):
-    temp=Trafico(M, N, V_max, k, semilla*k)
+    temp=Trafico(M, N, V_max, k, 1/3, semilla_punto(semilla, k))
     Resultados.append(temp)
 
 # Voy a graficar la distancia total en cada corrida vs nro. de autos.
-Distancia_total=[]
-for i in range(len(Resultados)):
-    Distancia=0
-    for j in range(len(Resultados[i][0,:])):        #loop sobre los autos en 
-                                                    #cada corrida.
-        temp=0
-        for l in range(N-1):
-            temp+=(Resultados[i][l+1,j]-Resultados[i][l,j])%M
-        Distancia+=temp
-    Distancia_total.append(Distancia)
+Distancia_total=[distancia_total(corrida, M) for corrida in Resultados]
 
 x=np.arange(55,505,5)
 plt.plot(x, Distancia_total, 'r.')
@@ -225,27 +188,17 @@ print("El maximo corresponde a ", int(Max.x), " autos.")
 
 # Muestro los resultados de la simulacion para el k de maximo desplazamiento, 
 # y dos mas, uno por debajo y otro por encima
-t=np.arange(N)
 fig, (ax0, ax1, ax2) = plt.subplots(nrows=1, ncols=3, sharex=True,
      figsize=(30,10))
 
 ax0.set_title("Simulacion {} autos".format(int(Max.x)-10))
-ax0.set_xlabel("Tiempo")
-ax0.set_ylabel("Distancia")
-ax0.plot(t, Resultados[(int(Max.x)-10-55)//5], color='grey', marker='.', markersize=0.2,
-                       linestyle='')
+graficar(Resultados[(int(Max.x)-10-55)//5], M, ax0)
 
 ax1.set_title("Simulacion {} autos".format(int(Max.x)))
-ax1.set_xlabel("Tiempo")
-ax1.set_ylabel("Distancia")
-ax1.plot(t, Resultados[(int(Max.x)-55)//5], color='grey', marker='.', markersize=0.2,
-                       linestyle='')
+graficar(Resultados[(int(Max.x)-55)//5], M, ax1)
 
 ax2.set_title("Simulacion {} autos".format(int(Max.x)+10))
-ax2.set_xlabel("Tiempo")
-ax2.set_ylabel("Distancia")
-ax2.plot(t, Resultados[(int(Max.x)+10-55)//5], color='grey', marker='.', markersize=0.2,
-                       linestyle='')
+graficar(Resultados[(int(Max.x)+10-55)//5], M, ax2)
 
 fig.suptitle("Resultados con distinta cantidad de autos")
 plt.savefig("Tres corridas.png", dpi=200)
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+MODULO Barrido
+Barridos de parametros para armar diagramas fundamentales en paralelo. Cada
+punto de la grilla (M, N, V_max, k, p, semilla) es una simulacion
+independiente; se reparten en bloques entre los procesos de un
+concurrent.futures.ProcessPoolExecutor. Cada punto usa su propio generador,
+hijo de `semilla` segun sus parametros (ver simulacion.semilla_punto), asi
+que los resultados no dependen de la cantidad de procesos ni del bloque.
+
+Ejemplo, el diagrama de pruebas.py para V_max=1,2,3 y p=0.5:
+
+    from barrido import Barrido
+    tabla = Barrido(1000, 1000, [1,2,3], np.arange(10,1000,10), 0.5, semilla)
+    tabla[tabla['V_max']==2]['flujo']
+
+BarridoProgresivo (y BarridoAsincrono, para asyncio) devuelven cada punto
+apenas termina. BarridoTrayectorias guarda las trayectorias de cada punto
+en disco en vez de devolverlas por el pool, y DiagramaAdaptativo arma una
+curva eligiendo las densidades segun la forma del diagrama, con muchas
+menos simulaciones que una grilla fija.
+"""
+import asyncio
+import contextlib
+import csv
+import functools
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import simulacion
+from cache import Cache
+from simulacion import semilla_punto
+from trayectorias import Trayectorias
+
+
+# Columnas de la tabla de resultados: una fila por punto de la grilla
+CAMPOS=[('M', np.int64), ('N', np.int64), ('V_max', np.int64),
+        ('k', np.int64), ('p', np.float64), ('semilla', np.int64),
+        ('densidad', np.float64), ('flujo', np.float64),
+        ('error', np.float64), ('pasos', np.int64)]
+
+
+def grilla(M, N, V_max, k, p, semilla):
+    """
+    Todas las combinaciones de los parametros. Cada uno puede ser un numero o
+    una lista de valores. Devuelve una lista de tuplas (M, N, V_max, k, p,
+    semilla).
+    """
+    ejes=[np.atleast_1d(x).tolist() for x in (M, N, V_max, k, p, semilla)]
+    validar_semillas(ejes[-1])
+    return list(itertools.product(*ejes))
+
+
+def validar_semillas(semillas):
+    """
+    Las semillas de un barrido tienen que ser enteros: de cada una salen las
+    de todos los puntos y van a la columna 'semilla' de la tabla. Se
+    controla antes de simular, para no perder el barrido al armar la tabla.
+    """
+    for semilla in semillas:
+        if not isinstance(semilla, (int, np.integer)):
+            raise ValueError("la semilla de un barrido tiene que ser un "
+                             "entero, no {!r}".format(semilla))
+
+
+def flujo_punto(punto, error=None, cache=None, motor='auto'):
+    """
+    Corre la simulacion de un punto de la grilla y devuelve su flujo, su
+    error estandar y los pasos medidos. Sin `error` se corren N pasos y el
+    error queda en nan; con `error` se usa simulacion.FlujoPreciso, con N
+    como maximo de pasos por replica. Con `cache` (una carpeta) los
+    resultados se guardan y se reusan (ver el modulo cache). `motor` es el
+    de simulacion.Mediciones ('auto', 'numpy' o 'red').
+    """
+    M, N, V_max, k, p, semilla = punto
+    semilla=semilla_punto(semilla, M, N, V_max, k, p)
+    simular=Cache(cache) if cache is not None else simulacion
+    if error is None:
+        r=simular.Mediciones(M, N, V_max, k, p, semilla, motor=motor)
+        return r['flujo'], np.nan, N
+    r=simular.FlujoPreciso(M, V_max, k, p, semilla, error=error,
+                           N_min=min(1000,N), N_max=N, motor=motor)
+    return r['flujo'], r['error'], r['pasos']
+
+
+def Barrido(M, N, V_max, k, p, semilla, procesos=None, bloque=None,
+            error=None, cache=None, motor='auto'):
+    """
+    Parametros:
+        M, N, V_max, k, p, semilla: como en simulacion.Trafico, pero cada uno
+            puede ser una lista; se simulan todas las combinaciones. La
+            semilla tiene que ser un entero (no None ni un Generator).
+        procesos: cantidad de procesos (por defecto, uno por nucleo). Con
+            procesos=1 se corre todo en el proceso actual.
+        bloque: cuantos puntos manda de una vez a cada proceso. Por defecto
+            reparte la grilla en unos 4 bloques por proceso.
+        error: si se da, cada punto corre solo hasta que el error estandar
+            de su flujo baja de `error` (N pasa a ser el maximo por replica)
+        cache: carpeta donde guardar y reusar los resultados de cada punto
+        motor: el motor de simulacion: 'auto', 'numpy' o 'red'
+
+    Devuelve una tabla (array estructurado) con una fila por punto: los
+    parametros, la densidad k/M, el flujo, su error y los pasos medidos.
+    """
+    puntos=grilla(M, N, V_max, k, p, semilla)
+    correr=functools.partial(flujo_punto, error=error, cache=cache,
+                             motor=motor)
+    with ejecutor(procesos) as mapear:
+        resultados=mapear(correr, puntos, bloque)
+    return armar_tabla(puntos, resultados)
+
+
+def BarridoProgresivo(M, N, V_max, k, p, semilla, procesos=None, error=None,
+                      cache=None, archivo=None, motor='auto'):
+    """
+    Como Barrido, pero es un generador que devuelve cada punto apenas
+    termina (en el orden en que terminan, no el de la grilla), asi se puede
+    ir graficando el diagrama mientras corre y cortar si algo anda mal.
+    Cada punto es un diccionario con las columnas de la tabla (ver CAMPOS).
+
+    Con `archivo` (un .csv), cada punto se agrega al archivo apenas termina,
+    asi que si se corta se conserva lo hecho. Si se deja de iterar (break, o
+    close() del generador) se cancelan los puntos que no empezaron.
+    """
+    puntos=grilla(M, N, V_max, k, p, semilla)
+    correr=functools.partial(flujo_punto, error=error, cache=cache,
+                             motor=motor)
+    if procesos is None:
+        procesos=os.cpu_count() or 1
+    if procesos==1:
+        for punto in puntos:
+            yield registrar(punto, correr(punto), archivo)
+        return
+
+    pool=ProcessPoolExecutor(max_workers=procesos)
+    try:
+        futuros={pool.submit(correr, punto): punto for punto in puntos}
+        for futuro in as_completed(futuros):
+            yield registrar(futuros[futuro], futuro.result(), archivo)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def BarridoAsincrono(M, N, V_max, k, p, semilla, procesos=None,
+                           error=None, cache=None, archivo=None,
+                           motor='auto'):
+    """
+    Lo mismo que BarridoProgresivo para asyncio (p. ej. en un notebook):
+        async for fila in BarridoAsincrono(...):
+            ...
+    No bloquea el event loop mientras espera. Cancelar la tarea que itera
+    cancela los puntos que no empezaron.
+    """
+    puntos=grilla(M, N, V_max, k, p, semilla)
+    correr=functools.partial(flujo_punto, error=error, cache=cache,
+                             motor=motor)
+    loop=asyncio.get_running_loop()
+    pool=ProcessPoolExecutor(max_workers=procesos)
+
+    async def uno(punto):
+        return punto, await loop.run_in_executor(pool, correr, punto)
+
+    tareas=[asyncio.ensure_future(uno(punto)) for punto in puntos]
+    try:
+        for siguiente in asyncio.as_completed(tareas):
+            punto, resultado = await siguiente
+            yield registrar(punto, resultado, archivo)
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def registrar(punto, resultado, archivo=None):
+    """
+    La fila de un punto como diccionario (las columnas de CAMPOS); si se da
+    `archivo`, tambien la agrega al final del .csv (con el encabezado, si
+    el archivo es nuevo).
+    """
+    fila=dict(zip(['M','N','V_max','k','p','semilla'], punto))
+    fila['densidad']=fila['k']/fila['M']
+    fila['flujo'], fila['error'], fila['pasos'] = resultado
+    if archivo is not None:
+        nuevo=not os.path.exists(archivo) or os.path.getsize(archivo)==0
+        with open(archivo, 'a', newline='') as f:
+            escritor=csv.DictWriter(f, fieldnames=[c for c, _ in CAMPOS])
+            if nuevo:
+                escritor.writeheader()
+            escritor.writerow(fila)
+    return fila
+
+
+def BarridoTrayectorias(M, N, V_max, k, p, semilla, carpeta, procesos=None,
+                        delta=False, motor='auto'):
+    """
+    Como Barrido, pero guardando las trayectorias de cada punto. Cada proceso
+    escribe las suyas directamente en disco, en una subcarpeta de `carpeta`
+    (ver el modulo trayectorias), y devuelve solo su nombre: los arrays de N
+    x k posiciones nunca pasan de un proceso a otro y el proceso principal
+    los lee mapeados en memoria, sin copiarlos, a medida que se usan.
+
+    Parametros:
+        M, N, V_max, k, p, semilla, procesos: como en Barrido
+        carpeta: donde se guardan las corridas
+        delta, motor: como en simulacion.Trafico ('numpy', 'red' o 'auto')
+
+    Devuelve la lista de puntos (M, N, V_max, k, p, semilla) de la grilla y
+    la de sus trayectorias (trayectorias.Trayectorias), en el mismo orden.
+    Por ejemplo, observables.diagrama(corridas, M) da el diagrama
+    fundamental leyendo de a bloques.
+    """
+    puntos=grilla(M, N, V_max, k, p, semilla)
+    correr=functools.partial(trayectoria_punto, carpeta=carpeta, delta=delta,
+                             motor=motor)
+    with ejecutor(procesos) as mapear:
+        archivos=mapear(correr, puntos)
+    return puntos, [Trayectorias(archivo) for archivo in archivos]
+
+
+def trayectoria_punto(punto, carpeta, delta=False, motor='auto'):
+    """
+    Corre la simulacion de un punto guardando las trayectorias en una
+    subcarpeta de `carpeta` y devuelve el nombre de la subcarpeta.
+    """
+    M, N, V_max, k, p, semilla = punto
+    archivo=os.path.join(carpeta, 'M{}_N{}_V{}_k{}_p{}_s{}'.format(*punto))
+    simulacion.Trafico(M, N, V_max, k, p,
+                       semilla_punto(semilla, M, N, V_max, k, p),
+                       motor=motor, archivo=archivo, delta=delta)
+    return archivo
+
+
+@contextlib.contextmanager
+def ejecutor(procesos=None):
+    """
+    Da una funcion mapear(funcion, puntos, bloque=None) que devuelve la lista
+    de funcion(punto) para cada punto, repartidos entre `procesos` procesos
+    (por defecto uno por nucleo; con procesos=1, en el proceso actual). Los
+    procesos se reusan entre llamadas. Sin bloque, cada llamada se reparte
+    en unos 4 bloques por proceso.
+    """
+    if procesos is None:
+        procesos=os.cpu_count() or 1
+    if procesos==1:
+        yield lambda funcion, puntos, bloque=None: [funcion(x) for x in puntos]
+        return
+
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        def mapear(funcion, puntos, bloque=None):
+            if bloque is None:
+                bloque=max(1, len(puntos)//(4*procesos))
+            return list(pool.map(funcion, puntos, chunksize=bloque))
+        yield mapear
+
+
+def armar_tabla(puntos, resultados):
+    """
+    Arma la tabla de resultados (ver CAMPOS) con los puntos de la grilla y
+    lo que devolvio flujo_punto para cada uno.
+    """
+    tabla=np.zeros(len(puntos),dtype=CAMPOS)
+    for nombre, columna in zip(['M','N','V_max','k','p','semilla'],
+                               zip(*puntos)):
+        tabla[nombre]=columna
+    tabla['densidad']=tabla['k']/tabla['M']
+    tabla['flujo'], tabla['error'], tabla['pasos'] = zip(*resultados)
+    return tabla
+
+
+def DiagramaAdaptativo(M, N, V_max, p, semilla, tolerancia=0.005, iniciales=9,
+                       separacion=None, maximo=200, procesos=None, error=None,
+                       cache=None, motor='auto'):
+    """
+    Un diagrama fundamental (una curva: un V_max y un p) eligiendo las
+    densidades de a poco. Arranca con `iniciales` densidades equiespaciadas
+    mas la critica, M/(V_max+1), y en cada ronda simula el punto medio de
+    los intervalos donde la curva no es lineal: si un punto se aparta mas
+    de `tolerancia` de la recta entre sus vecinos (sumando su error, si se
+    estimo), se parten los dos intervalos de al lado. Asi los puntos se
+    juntan cerca del maximo del flujo y no en las partes rectas. Termina
+    cuando la interpolacion lineal alcanza la tolerancia, cuando los
+    intervalos a partir tienen menos de 2*separacion autos o cuando se
+    simularon `maximo` puntos.
+
+    Parametros:
+        M, N, V_max, p, semilla, procesos, error, cache, motor: como en
+            Barrido (aca V_max y p son un solo numero)
+        tolerancia: error de interpolacion aceptado, en unidades de flujo
+        iniciales: cantidad de densidades de la primera ronda
+        separacion: minima diferencia de autos entre puntos (por defecto,
+            M/200)
+        maximo: cantidad maxima de simulaciones
+
+    Devuelve la tabla de Barrido, ordenada por densidad. Cada punto usa la
+    misma semilla que en Barrido, asi que da lo mismo que ese k en Barrido.
+    """
+    validar_semillas([semilla])
+    if separacion is None:
+        separacion=max(1, M//200)
+    k=set(np.linspace(1,M-1,iniciales).round().astype(int).tolist())
+    k.add(int(round(M/(V_max+1))))
+
+    correr=functools.partial(flujo_punto, error=error, cache=cache,
+                             motor=motor)
+    resultados={}
+    nuevos=sorted(k)[:maximo]
+    with ejecutor(procesos) as mapear:
+        while nuevos:
+            puntos=[(M, N, V_max, x, p, semilla) for x in nuevos]
+            resultados.update(zip(nuevos, mapear(correr, puntos)))
+            nuevos=refinar(resultados, tolerancia, separacion)
+            nuevos=nuevos[:maximo-len(resultados)]
+
+    k=sorted(resultados)
+    return armar_tabla([(M, N, V_max, x, p, semilla) for x in k],
+                       [resultados[x] for x in k])
+
+
+def refinar(resultados, tolerancia, separacion):
+    """
+    Los k nuevos a simular: los puntos medios de los intervalos a partir,
+    los de mayor desvio primero. `resultados` es un diccionario k ->
+    (flujo, error, pasos).
+    """
+    k=np.array(sorted(resultados))
+    flujo=np.array([resultados[x][0] for x in k])
+    error=np.nan_to_num(np.array([resultados[x][1] for x in k]))
+
+    # Desvio de cada punto interior respecto de la recta entre sus vecinos
+    peso=(k[1:-1]-k[:-2])/(k[2:]-k[:-2])
+    recta=flujo[:-2]+peso*(flujo[2:]-flujo[:-2])
+    desvio=np.abs(flujo[1:-1]-recta)+error[1:-1]
+
+    # Cada intervalo hereda el mayor desvio de sus dos extremos
+    prioridad=np.zeros(k.size-1)
+    np.maximum(prioridad[:-1],desvio,out=prioridad[:-1])
+    np.maximum(prioridad[1:],desvio,out=prioridad[1:])
+
+    partir=(prioridad>tolerancia)&(np.diff(k)>=2*separacion)
+    orden=np.argsort(-prioridad[partir],kind='stable')
+    medios=((k[:-1]+k[1:])//2)[partir][orden]
+    return [int(x) for x in medios if x not in resultados]
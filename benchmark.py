@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de los motores de simulacion.
+
+Mide cuantas actualizaciones de auto por segundo (autos x pasos / segundos)
+hace cada motor y cuanta memoria usa como maximo, sobre una grilla de largo
+de ruta M, densidad k/M, V_max y p. Escribe los resultados en JSON y, si se
+da un archivo de base (un JSON de una corrida anterior), falla (sale con
+codigo 1) cuando algun caso anda mas lento que la base por mas del umbral.
+
+Uso:
+    python benchmark.py --salida resultados.json
+    python benchmark.py --rapido --base base.json --umbral 0.2
+
+Los motores son los de simulacion: 'numpy', 'red', 'numba' (solo si numba
+esta instalado) y 'python' (el loop en Python puro, solo en rutas chicas).
+Los motores 'numpy', 'red' y 'numba' no se miden a traves de Trafico ni
+Mediciones: se llama directo a su paso, sin guardar posiciones ni detectar
+ciclos, para medir solo el motor. El loop de 'python' no tiene un paso
+aparte, asi que se corre con Trafico(..., motor='python', N1=0) y sus
+tiempos incluyen guardar las posiciones (poco al lado del loop en Python).
+"""
+import argparse
+import importlib.util
+import json
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import simulacion
+
+
+MOTORES=['numpy', 'red', 'numba', 'python']
+
+
+def preparar(motor, M, V_max, k, p):
+    """
+    Devuelve una funcion correr(pasos) que hace `pasos` pasos del motor.
+    """
+    rng=simulacion.uniformes(0, k)
+    if motor in ('numpy', 'red'):
+        avanzar=simulacion.avanzador(M, V_max, k, p, rng, motor)
+        def correr(pasos):
+            for _ in range(pasos):
+                avanzar()
+    elif motor == 'numba':
+        bucle=simulacion.bucle_compilado()
+        X, V = simulacion.condicion_inicial(M, k)
+        vacio=np.empty((0,k),dtype=np.int64)
+        rng=np.random.default_rng(0)
+        def correr(pasos):
+            bucle(X, V, M, V_max, p, rng, pasos, vacio)
+    elif motor == 'python':
+        # Este motor solo existe dentro de Trafico (que guarda Pos)
+        def correr(pasos):
+            simulacion.Trafico(M, pasos, V_max, k, p, 0, motor='python', N1=0)
+    else:
+        raise ValueError("motor desconocido: {}".format(motor))
+    return correr
+
+
+def medir(motor, M, densidad, V_max, p, actualizaciones):
+    """
+    Mide un caso. `actualizaciones` es cuantas actualizaciones de auto hacer
+    (define la cantidad de pasos).
+    """
+    k=max(1,int(densidad*M))
+    pasos=max(10,int(actualizaciones//k))
+
+    correr=preparar(motor, M, V_max, k, p)
+    correr(1)                           # Compila / calienta caches
+    inicio=time.perf_counter()
+    correr(pasos)
+    segundos=time.perf_counter()-inicio
+
+    # La memoria en una corrida aparte y corta: tracemalloc hace mas lento
+    # el codigo en Python.
+    tracemalloc.start()
+    preparar(motor, M, V_max, k, p)(min(pasos,10))
+    memoria=tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'motor': motor, 'M': M, 'densidad': densidad, 'k': k,
+            'V_max': V_max, 'p': p, 'pasos': pasos, 'segundos': segundos,
+            'actualizaciones_por_segundo': k*pasos/segundos,
+            'memoria_pico': memoria}
+
+
+def casos(args):
+    """
+    La grilla de casos a medir, salteando los que no corresponden.
+    """
+    for motor in args.motores:
+        if motor == 'numba' and importlib.util.find_spec('numba') is None:
+            print("numba no esta instalado: no se mide el motor 'numba'",
+                  file=sys.stderr)
+            continue
+        for M in args.M:
+            if motor == 'python' and M>args.M_python:
+                continue
+            for densidad in args.densidades:
+                for V_max in args.V_max:
+                    for p in args.p:
+                        yield motor, M, densidad, V_max, p
+
+
+def clave(resultado):
+    return tuple(resultado[c] for c in ('motor','M','densidad','V_max','p'))
+
+
+def comparar(resultados, base, umbral):
+    """
+    Devuelve los casos que andan mas lento que en la base por mas del umbral
+    (p. ej. 0.2 = 20%).
+    """
+    anteriores={clave(r): r for r in base}
+    peores=[]
+    for r in resultados:
+        anterior=anteriores.get(clave(r))
+        if anterior is None:
+            continue
+        relacion=(r['actualizaciones_por_segundo']
+                  /anterior['actualizaciones_por_segundo'])
+        if relacion<1-umbral:
+            peores.append((r, relacion))
+    return peores
+
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--M', type=int, nargs='+',
+                        default=[10**3, 10**4, 10**5, 10**6])
+    parser.add_argument('--densidades', type=float, nargs='+',
+                        default=[0.1, 0.5, 0.9])
+    parser.add_argument('--V_max', type=int, nargs='+', default=[1, 5])
+    parser.add_argument('--p', type=float, nargs='+', default=[0, 0.5])
+    parser.add_argument('--motores', nargs='+', default=MOTORES,
+                        choices=MOTORES)
+    parser.add_argument('--actualizaciones', type=float, default=1e7,
+                        help='actualizaciones de auto por caso')
+    parser.add_argument('--M_python', type=int, default=10**3,
+                        help="M maximo para el motor 'python'")
+    parser.add_argument('--rapido', action='store_true',
+                        help='grilla chica, para probar rapido')
+    parser.add_argument('--salida', default='benchmark.json')
+    parser.add_argument('--base', help='JSON de una corrida anterior')
+    parser.add_argument('--umbral', type=float, default=0.2,
+                        help='caida tolerada respecto de la base')
+    args=parser.parse_args(argv)
+    if args.rapido:
+        args.M=[10**3, 10**5]
+        args.densidades=[0.1, 0.9]
+        args.V_max=[5]
+        args.p=[0.5]
+        args.actualizaciones=1e6
+
+    resultados=[]
+    for motor, M, densidad, V_max, p in casos(args):
+        actualizaciones=args.actualizaciones
+        if motor == 'python':
+            actualizaciones/=1000
+        r=medir(motor, M, densidad, V_max, p, actualizaciones)
+        resultados.append(r)
+        print("{motor:>6} M={M:<8} densidad={densidad:<4} V_max={V_max} "
+              "p={p:<4} {actualizaciones_por_segundo:12.3e} act/s "
+              "{memoria_pico:12,d} bytes".format(**r))
+
+    with open(args.salida, 'w') as f:
+        json.dump(resultados, f, indent=1)
+
+    if args.base:
+        with open(args.base) as f:
+            base=json.load(f)
+        peores=comparar(resultados, base, args.umbral)
+        for r, relacion in peores:
+            print("MAS LENTO: {} {:.0%} de la base".format(clave(r), relacion),
+                  file=sys.stderr)
+        if peores:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
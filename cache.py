@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+MODULO Cache
+Guarda en disco los resultados de las simulaciones, para no repetir la misma
+corrida cada vez que se vuelve a ejecutar un script o una celda del notebook.
+Cada resultado se identifica por el hash de la funcion, todos sus parametros
+(M, N, V_max, k, p, semilla, motor, ...) y simulacion.VERSION_MOTOR.
+
+Las trayectorias se guardan comprimidas, como lo que avanza cada auto en cada
+paso en el tipo entero mas chico que alcance; las Mediciones, como los
+numeros y el array de distancias. Cuando la carpeta pasa de `tamano_max`
+bytes se borran los resultados usados hace mas tiempo (LRU). El tamano de la
+carpeta se lleva sumando lo que se escribe, asi que solo se recorre la
+carpeta cuando hay que borrar.
+
+Varios procesos pueden usar la misma carpeta a la vez: cada archivo se
+escribe con otro nombre y se renombra al final (os.replace es atomico), asi
+que nunca se lee un resultado a medio escribir, y el total y el borrado se
+actualizan con un lock (si el sistema tiene fcntl), tolerando que otro
+proceso ya haya borrado.
+
+Ejemplo:
+    from cache import Cache
+    cache = Cache('resultados')
+    corrida = cache.Trafico(1000, 1000, 5, 150, 0.5, semilla)
+"""
+import hashlib
+import inspect
+import json
+import os
+
+import numpy as np
+
+import simulacion
+from puntos_control import escribir_atomico
+from simulacion import identificar_semilla
+from trayectorias import tipo_minimo
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# Con estos parametros no se cachea: el archivo ya guarda las trayectorias,
+# el perfil y el observador tienen que ver correr la simulacion y el punto
+# de control ya guarda el resultado.
+NO_CACHEAR=('archivo', 'perfil', 'observador', 'control')
+
+# Parametros que no cambian el resultado y no van en la clave
+NO_CLAVE=('perfil', 'observador', 'cada', 'cada_control')
+
+# Al pasar de tamano_max se poda hasta esta fraccion
+PODA=0.9
+
+
+class Cache:
+    """
+    Parametros:
+        carpeta: donde se guardan los resultados
+        tamano_max: tamano maximo de la carpeta, en bytes
+    """
+
+    def __init__(self, carpeta='cache_trafico', tamano_max=2**30):
+        self.carpeta=carpeta
+        self.tamano_max=tamano_max
+        os.makedirs(carpeta, exist_ok=True)
+
+    # Las funciones cacheadas: mismos parametros que en simulacion
+
+    def Trafico(self, *args, **kwargs):
+        return self.llamar(simulacion.Trafico, args, kwargs,
+                           _guardar_trafico, _leer_trafico)
+
+    def Mediciones(self, *args, **kwargs):
+        return self.llamar(simulacion.Mediciones, args, kwargs,
+                           _guardar_dict, _leer_dict)
+
+    def FlujoPreciso(self, *args, **kwargs):
+        return self.llamar(simulacion.FlujoPreciso, args, kwargs,
+                           _guardar_dict, _leer_dict)
+
+    def llamar(self, funcion, args, kwargs, guardar, leer):
+        """
+        Devuelve funcion(*args, **kwargs), del disco si ya estaba. Con una
+        semilla que no se puede reproducir (None o un Generator) no se cachea.
+        """
+        parametros=inspect.signature(funcion).bind(*args, **kwargs)
+        parametros.apply_defaults()
+        parametros=dict(parametros.arguments)
+        if any(parametros.get(p) is not None for p in NO_CACHEAR):
+            return funcion(*args, **kwargs)
+        for p in NO_CLAVE:
+            parametros.pop(p, None)
+        semilla=identificar_semilla(parametros.get('semilla'))
+        if semilla is None:
+            return funcion(*args, **kwargs)
+        parametros['semilla']=semilla
+
+        nombre=self.ruta(clave(funcion.__name__, parametros))
+        try:
+            with np.load(nombre) as datos:
+                resultado=leer(datos, parametros)
+            os.utime(nombre)            # Para el LRU: lo acabo de usar
+            return resultado
+        except (FileNotFoundError, OSError, ValueError, KeyError):
+            pass
+
+        resultado=funcion(*args, **kwargs)
+        self.guardar(nombre, guardar(resultado, parametros))
+        return resultado
+
+    def ruta(self, clave):
+        return os.path.join(self.carpeta, clave[:2], clave+'.npz')
+
+    def guardar(self, nombre, datos):
+        """
+        Escribe el .npz (ver puntos_control.escribir_atomico) y lo suma al
+        tamano de la carpeta.
+        """
+        os.makedirs(os.path.dirname(nombre), exist_ok=True)
+        tamano=escribir_atomico(nombre,
+                                lambda f: np.savez_compressed(f, **datos))
+        self.sumar(tamano)
+
+    def sumar(self, tamano):
+        """
+        Suma `tamano` bytes al total de la carpeta, que se guarda en el
+        archivo .tamano para que lo compartan todos los procesos. Recien
+        cuando pasa de tamano_max se recorre la carpeta y se poda hasta
+        PODA*tamano_max, asi que no se poda en cada escritura.
+        """
+        with _Lock(os.path.join(self.carpeta, '.lock')):
+            total=self._leer_total()
+            if total is None:
+                total=self._podar(self.tamano_max)
+            else:
+                total+=tamano
+            if total>self.tamano_max:
+                total=self._podar(PODA*self.tamano_max)
+            self._guardar_total(total)
+
+    def podar(self, limite=None):
+        """
+        Borra los resultados usados hace mas tiempo hasta que la carpeta
+        quede por debajo de `limite` bytes (por defecto, tamano_max).
+        """
+        with _Lock(os.path.join(self.carpeta, '.lock')):
+            total=self._podar(self.tamano_max if limite is None else limite)
+            self._guardar_total(total)
+
+    def _podar(self, limite):
+        """
+        Lo de podar, con el lock ya tomado: recorre la carpeta, borra y
+        devuelve el tamano que queda.
+        """
+        archivos=[]
+        for raiz, _, nombres in os.walk(self.carpeta):
+            for n in nombres:
+                if not n.endswith('.npz'):
+                    continue
+                ruta=os.path.join(raiz, n)
+                try:
+                    info=os.stat(ruta)
+                except FileNotFoundError:
+                    continue
+                archivos.append((info.st_mtime, info.st_size, ruta))
+
+        total=sum(tamano for _, tamano, _ in archivos)
+        for _, tamano, ruta in sorted(archivos):
+            if total<=limite:
+                break
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+            total-=tamano
+        return total
+
+    def _leer_total(self):
+        try:
+            with open(os.path.join(self.carpeta, '.tamano')) as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _guardar_total(self, total):
+        with open(os.path.join(self.carpeta, '.tamano'), 'w') as f:
+            f.write(str(total))
+
+    def limpiar(self):
+        """
+        Borra todos los resultados.
+        """
+        self.podar(-1)
+
+
+def clave(nombre, parametros):
+    """
+    El hash (sha256) de la funcion, sus parametros y la version del motor.
+    """
+    def normalizar(x):
+        if isinstance(x, np.generic):
+            return x.item()
+        if isinstance(x, np.ndarray):
+            return x.tolist()
+        return x
+    texto=json.dumps([nombre, simulacion.VERSION_MOTOR,
+                      {k: normalizar(v) for k, v in sorted(parametros.items())}],
+                     default=str)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+# Las trayectorias se guardan como la primera fila y lo que avanza cada auto
+# en cada paso (a lo sumo V_max), que se comprime mucho mejor.
+
+def _guardar_trafico(Pos, parametros):
+    avance=np.diff(Pos,axis=0)%parametros['M']
+    return {'inicio': Pos[:1].astype(tipo_minimo(parametros['M']-1)),
+            'avance': avance.astype(tipo_minimo(parametros['V_max']))}
+
+def _leer_trafico(datos, parametros):
+    Pos=np.concatenate((datos['inicio'],datos['avance'])).astype(np.int64)
+    np.cumsum(Pos,axis=0,out=Pos)
+    Pos%=parametros['M']
+    return Pos
+
+def _guardar_dict(resultado, parametros):
+    return {k: np.asarray(v) for k, v in resultado.items()}
+
+def _leer_dict(datos, parametros):
+    return {k: (datos[k].item() if datos[k].ndim==0 else datos[k])
+            for k in datos.files}
+
+
+class _Lock:
+    """
+    Lock entre procesos sobre un archivo (no hace nada si no hay fcntl).
+    """
+
+    def __init__(self, nombre):
+        self.nombre=nombre
+
+    def __enter__(self):
+        self._f=open(self.nombre, 'a')
+        if fcntl is not None:
+            fcntl.flock(self._f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *excepcion):
+        if fcntl is not None:
+            fcntl.flock(self._f, fcntl.LOCK_UN)
+        self._f.close()
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+MODULO Detectores
+Mediciones que se van acumulando mientras corre la simulacion, sin guardar
+las trayectorias: se pasan como observador= a simulacion.Trafico o
+simulacion.Mediciones (con cada=1, porque tienen que ver todos los pasos) y
+se llaman en cada paso con las posiciones X y las velocidades V. Todo lo que
+guardan tiene tamano fijo, asi que sirven para corridas de 10^6 pasos.
+
+    Detectores: espiras virtuales en celdas fijas de la ruta, que cuentan
+        los autos que pasan y su velocidad, y la ocupacion de la celda, por
+        ventanas de tiempo
+    Embotellamientos: tamano y duracion de los embotellamientos (grupos de
+        autos parados uno pegado al otro)
+    Varios: para pasar mas de un observador a la vez
+
+Ejemplo:
+    espiras = Detectores(M, [0, M//2], ventana=100)
+    atascos = Embotellamientos(M, k)
+    Mediciones(M, N, V_max, k, p, semilla, observador=Varios(espiras, atascos))
+    espiras.resultados()['flujo'], atascos.vida_media()
+"""
+import numpy as np
+
+
+class Varios:
+    """
+    Un observador que llama a todos los que se le pasan.
+    """
+
+    def __init__(self, *observadores):
+        self.observadores=observadores
+
+    def __call__(self, t, X, V):
+        for observador in self.observadores:
+            observador(t, X, V)
+
+
+class Detectores:
+    """
+    Espiras virtuales en las celdas `sitios`. Un auto pasa por la celda s en
+    un paso si la cruza o llega a ella: va de x-V a x con s en (x-V, x].
+    Cada `ventana` pasos se cierra una ventana con, para cada espira:
+        pasadas: cuantos autos pasaron
+        flujo: pasadas/ventana (autos por paso)
+        velocidad: la velocidad media de los que pasaron (nan si ninguno)
+        ocupacion: la fraccion de los pasos en que la celda estuvo ocupada
+    Se guardan las ultimas `capacidad` ventanas; los totales de toda la
+    corrida estan en totales().
+    """
+
+    def __init__(self, M, sitios, ventana=100, capacidad=10000):
+        self.M=M
+        self.sitios=np.atleast_1d(np.asarray(sitios,dtype=np.int64))
+        self.ventana=ventana
+        self.capacidad=capacidad
+        S=self.sitios.size
+
+        # La ventana actual
+        self._pasadas=np.zeros(S,dtype=np.int64)
+        self._velocidad=np.zeros(S,dtype=np.int64)
+        self._ocupada=np.zeros(S,dtype=np.int64)
+        self._pasos=0
+
+        # Las ventanas cerradas (buffer circular) y los totales
+        self._ventanas=np.zeros((3,capacidad,S),dtype=np.int64)
+        self._cerradas=0
+        self._totales=np.zeros((3,S),dtype=np.int64)
+        self._pasos_totales=0
+
+    def __call__(self, t, X, V):
+        # Solo pueden haber pasado por s los autos que estan en
+        # [s, s+alcance]; como los autos no se pasan, X esta ordenado
+        # salvo un corte (el primer auto de la ruta), asi que se encuentran
+        # con searchsorted en los dos tramos ordenados.
+        M=self.M
+        S=self.sitios.size
+        alcance=int(V.max())
+        r=int(np.argmin(X))
+        fin=self.sitios+alcance
+        desdes, hastas, sitio = [], [], []
+        for a, b in ((self.sitios, np.minimum(fin,M-1)),
+                     (np.zeros(S,dtype=np.int64), fin-M)):
+            for tramo, corrido in ((X[r:], r), (X[:r], 0)):
+                desdes.append(np.searchsorted(tramo,a)+corrido)
+                hastas.append(np.searchsorted(tramo,b,side='right')+corrido)
+                sitio.append(np.arange(S))
+        desdes=np.concatenate(desdes)
+        cuantos=np.maximum(np.concatenate(hastas)-desdes,0)
+        sitio=np.repeat(np.concatenate(sitio),cuantos)
+        autos=(np.repeat(desdes-np.cumsum(cuantos)+cuantos,cuantos)
+               +np.arange(cuantos.sum()))
+
+        x=X[autos]
+        v=V[autos]
+        s=self.sitios[sitio]
+        pasa=((s-x+v-1)%M)<v
+        self._pasadas+=np.bincount(sitio[pasa],minlength=S)
+        self._velocidad+=np.bincount(sitio[pasa],weights=v[pasa],
+                                     minlength=S).astype(np.int64)
+        self._ocupada+=np.bincount(sitio[x==s],minlength=S)
+        self._pasos+=1
+        if self._pasos==self.ventana:
+            self._cerrar()
+
+    def _cerrar(self):
+        acumulado=(self._pasadas, self._velocidad, self._ocupada)
+        fila=self._cerradas%self.capacidad
+        for i, a in enumerate(acumulado):
+            self._ventanas[i,fila]=a
+            self._totales[i]+=a
+            a[:]=0
+        self._pasos_totales+=self._pasos
+        self._pasos=0
+        self._cerradas+=1
+
+    def resultados(self):
+        """
+        Las ventanas guardadas, de la mas vieja a la mas nueva: un
+        diccionario de arrays de ventanas x sitios.
+        """
+        n=min(self._cerradas, self.capacidad)
+        orden=(np.arange(n)+self._cerradas-n)%self.capacidad
+        pasadas, velocidad, ocupada = self._ventanas[:,orden]
+        return self._medidas(pasadas, velocidad, ocupada, self.ventana)
+
+    def totales(self):
+        """
+        Lo mismo que resultados, para todas las ventanas cerradas juntas:
+        un valor por sitio.
+        """
+        return self._medidas(*self._totales, max(self._pasos_totales,1))
+
+    def _medidas(self, pasadas, velocidad, ocupada, pasos):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media=velocidad/pasadas
+        return {'pasadas': pasadas, 'flujo': pasadas/pasos,
+                'velocidad': media, 'ocupacion': ocupada/pasos}
+
+
+class Embotellamientos:
+    """
+    Los embotellamientos: grupos de autos consecutivos con velocidad <=
+    `umbral` (por defecto, parados) y pegados uno al otro. En cada paso se
+    acumula el histograma de tamanos (cuantos autos tiene cada uno).
+
+    Para la duracion se siguen de un paso al siguiente: un embotellamiento
+    sigue vivo si alguno de sus autos, o el auto de atras (que es el que se
+    suma cuando el de adelante arranca), esta en un embotellamiento en el
+    paso siguiente. Si dos se juntan sigue el mas viejo y el otro termina;
+    si uno se parte, sigue la parte de atras y las otras nacen. Cuando
+    termina se suma su duracion (en pasos) al histograma de vidas, hasta
+    `vida_max` (las mas largas van a la ultima casilla). Los que siguen
+    vivos al final no se cuentan.
+    """
+
+    def __init__(self, M, k, umbral=0, vida_max=10000):
+        self.M=M
+        self.k=k
+        self.umbral=umbral
+        self.tamanos=np.zeros(k+1,dtype=np.int64)
+        self.vidas=np.zeros(vida_max+1,dtype=np.int64)
+        self.pasos=0
+        self.parados=0
+        # Para cada auto, el embotellamiento en que estaba (-1 si ninguno), y
+        # cuando nacio cada embotellamiento del paso anterior
+        self._grupo=np.full(k,-1,dtype=np.int64)
+        self._nacimiento=np.zeros(0,dtype=np.int64)
+
+    def __call__(self, t, X, V):
+        inicio, fin = self.grupos(X, V)
+        tamano=(fin-inicio)%self.k+1
+        self.tamanos+=np.bincount(tamano,minlength=self.k+1)
+        self.parados+=tamano.sum()
+        self.pasos+=1
+        self._seguir(t, inicio, fin)
+
+    def grupos(self, X, V):
+        """
+        Los embotellamientos de un paso: los indices del primer auto (el de
+        mas atras) y del ultimo de cada uno, recorriendo los autos en orden
+        a partir de un borde entre grupos (fin puede ser menor que inicio si
+        el grupo pasa del ultimo auto al primero).
+        """
+        k=self.k
+        parado=V<=self.umbral
+        if not parado.any():
+            vacio=np.zeros(0,dtype=np.int64)
+            return vacio, vacio
+
+        # pegado[i]: el auto i y el de adelante estan en el mismo grupo
+        pegado=parado&np.roll(parado,-1)&(((np.roll(X,-1)-X)%self.M)==1)
+        if k==1:
+            pegado[:]=False
+        if pegado.all():                # Un solo grupo con todos los autos
+            return np.array([0]), np.array([k-1])
+
+        # Roto para que el auto 0 empiece un grupo (o no este en ninguno)
+        r=int(np.flatnonzero(~pegado)[-1])+1
+        orden=np.roll(np.arange(k),-r)
+        p=parado[orden]
+        g=pegado[orden]
+        empieza=p&np.concatenate(([True],~g[:-1]))
+        termina=p&~g
+        return orden[np.flatnonzero(empieza)], orden[np.flatnonzero(termina)]
+
+    def _seguir(self, t, inicio, fin):
+        k=self.k
+        G=inicio.size
+        nacimiento=np.full(G,t,dtype=np.int64)
+
+        # El grupo anterior de cada grupo nuevo: el mas viejo entre los de
+        # sus autos y el de atras de todo
+        previos=self._nacimiento.size
+        if previos and G:
+            # Cada auto con nacimiento*previos+grupo: el minimo de un tramo
+            # de autos es el grupo mas viejo. Lo duplico para que los tramos
+            # que pasan del ultimo auto al primero queden seguidos.
+            nada=np.iinfo(np.int64).max
+            en_grupo=self._grupo>=0
+            clave=np.full(k,nada,dtype=np.int64)
+            clave[en_grupo]=(self._nacimiento[self._grupo[en_grupo]]*previos
+                             +self._grupo[en_grupo])
+            clave=np.concatenate((clave,clave))
+
+            atras=(inicio-1)%k
+            largo=np.minimum((fin-atras)%k+1,k)
+            tramos=np.column_stack((atras,atras+largo)).ravel()
+            minimo=np.minimum.reduceat(clave,tramos)[::2]
+            elegido=np.where(minimo<nada, minimo%previos, -1)
+
+            # Si uno se partio, sigue solo el primero (el de atras)
+            sigue=elegido>=0
+            _, primero = np.unique(elegido, return_index=True)
+            unico=np.zeros(G,dtype=bool)
+            unico[primero]=True
+            sigue&=unico
+            nacimiento[sigue]=self._nacimiento[elegido[sigue]]
+            continuados=elegido[sigue]
+        else:
+            continuados=np.zeros(0,dtype=np.int64)
+
+        # Los que no siguieron terminaron
+        termino=np.ones(previos,dtype=bool)
+        termino[continuados]=False
+        vidas=t-self._nacimiento[termino]
+        np.minimum(vidas,self.vidas.size-1,out=vidas)
+        self.vidas+=np.bincount(vidas,minlength=self.vidas.size)
+
+        # Guardo el grupo de cada auto para el paso siguiente
+        self._grupo[:]=-1
+        tamano=(fin-inicio)%k+1
+        autos=(np.repeat(inicio,tamano)+np.arange(tamano.sum())
+               -np.repeat(np.cumsum(tamano)-tamano,tamano))%k
+        self._grupo[autos]=np.repeat(np.arange(G),tamano)
+        self._nacimiento=nacimiento
+
+    def tamano_medio(self):
+        """
+        El tamano medio de los embotellamientos (en autos).
+        """
+        cantidad=self.tamanos.sum()
+        if not cantidad:
+            return np.nan
+        return np.arange(self.tamanos.size)@self.tamanos/cantidad
+
+    def vida_media(self):
+        """
+        La duracion media (en pasos) de los embotellamientos que terminaron.
+        """
+        cantidad=self.vidas.sum()
+        if not cantidad:
+            return np.nan
+        return np.arange(self.vidas.size)@self.vidas/cantidad
+
+    def fraccion_parados(self):
+        """
+        La fraccion de los autos que estaban en un embotellamiento.
+        """
+        return self.parados/(self.k*max(self.pasos,1))
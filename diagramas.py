@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+MODULO Diagramas
+Diagramas espacio-tiempo de corridas grandes. En vez de graficar un punto
+por auto y por paso (plt.plot(x, Pos, marker='.'), que crea una linea por
+auto y se vuelve inusable con muchos autos o pasos), se arma una imagen de
+tiempo x posicion contando en cada pixel cuantas celdas ocupadas cae, y se
+dibuja con un solo imshow o se guarda directo con imsave. Si la corrida es
+mas grande que la imagen, cada pixel junta varias celdas y pasos, y el gris
+es la fraccion ocupada.
+
+Acepta el array Pos de simulacion.Trafico o un trayectorias.Trayectorias,
+que se lee de a bloques de filas.
+
+matplotlib se importa solo al dibujar: espacio_tiempo no lo necesita.
+
+Ejemplo:
+    from diagramas import graficar
+    graficar(Trafico(1000, 1000, 5, 150, 0.5, semilla), 1000)
+    plt.show()
+"""
+import numpy as np
+
+
+def espacio_tiempo(Pos, M, alto=None, ancho=None, filas=4096):
+    """
+    La imagen del diagrama: un array de alto x ancho (tiempo x posicion) con
+    la fraccion de celdas ocupadas en cada pixel. Por defecto, un pixel por
+    paso y por celda, hasta 4000 de cada lado. Como cada pixel junta una
+    cantidad entera de pasos y de celdas, la imagen puede quedar un poco mas
+    chica que lo pedido.
+    """
+    N=len(Pos)
+    # Pasos y celdas que junta cada pixel
+    por_fila=-(-N//(min(N,4000) if alto is None else alto))
+    por_columna=-(-M//(min(M,4000) if ancho is None else ancho))
+    alto=-(-N//por_fila)
+    ancho=-(-M//por_columna)
+
+    cuenta=np.zeros(alto*ancho,dtype=np.int64)
+    for a in range(0,N,filas):
+        tramo=np.asarray(Pos[a:a+filas],dtype=np.int64)
+        fila=(np.arange(a,a+len(tramo))//por_fila)[:,None]
+        pixel=fila*ancho+tramo//por_columna
+        cuenta+=np.bincount(pixel.ravel(),minlength=cuenta.size)
+
+    # Lo divido por las celdas de cada pixel (los del borde pueden tener menos)
+    pasos=np.bincount(np.arange(N)//por_fila)
+    celdas=np.bincount(np.arange(M)//por_columna)
+    imagen=cuenta.reshape(alto,ancho).astype(np.float32)
+    imagen/=np.outer(pasos,celdas)
+    return imagen
+
+
+def graficar(Pos, M, ax=None, alto=None, ancho=None, cmap='Greys'):
+    """
+    Dibuja el diagrama como los graficos de siempre: el tiempo en el eje x y
+    la posicion en el y. Devuelve lo que devuelve imshow.
+    """
+    from matplotlib import pyplot as plt
+
+    imagen=espacio_tiempo(Pos, M, alto, ancho)
+    if ax is None:
+        ax=plt.gca()
+    ax.set_xlabel('Tiempo')
+    ax.set_ylabel('Distancia')
+    return ax.imshow(imagen.T, origin='lower', aspect='auto', cmap=cmap,
+                     vmin=0, vmax=1, interpolation='nearest',
+                     extent=(0, len(Pos), 0, M))
+
+
+def guardar(Pos, M, archivo, alto=None, ancho=None, cmap='Greys'):
+    """
+    Guarda el diagrama como imagen (p. ej. .png), un pixel por pixel de la
+    imagen, sin armar una figura.
+    """
+    from matplotlib import pyplot as plt
+
+    imagen=espacio_tiempo(Pos, M, alto, ancho)
+    plt.imsave(archivo, imagen.T, origin='lower', cmap=cmap, vmin=0, vmax=1)
+
+
+def pelicula(Pos, M, archivo, ventana=200, paso=1, fps=30, ancho=None,
+             cmap='Greys'):
+    """
+    Una pelicula del diagrama que se va corriendo en el tiempo: cada cuadro
+    muestra `ventana` pasos de la misma imagen de espacio_tiempo, avanzando
+    de a `paso` pasos. El formato sale de la extension de `archivo` (.gif
+    con pillow, .mp4 con ffmpeg).
+    """
+    from matplotlib import animation
+    from matplotlib import pyplot as plt
+
+    imagen=espacio_tiempo(Pos, M, alto=len(Pos), ancho=ancho)
+    ventana=min(ventana, len(imagen))
+    fig, ax = plt.subplots()
+    ax.set_xlabel('Tiempo')
+    ax.set_ylabel('Distancia')
+    cuadro=ax.imshow(imagen[:ventana].T, origin='lower', aspect='auto',
+                     cmap=cmap, vmin=0, vmax=1, interpolation='nearest',
+                     extent=(0, ventana, 0, M))
+
+    def actualizar(t):
+        cuadro.set_data(imagen[t-ventana:t].T)
+        return cuadro,
+
+    cuadros=range(ventana, len(imagen)+1, paso)
+    animacion=animation.FuncAnimation(fig, actualizar, frames=cuadros,
+                                      blit=True)
+    animacion.save(archivo, fps=fps)
+    plt.close(fig)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+MODULO Dominios
+Nagel-Schreckenberg para rutas muy largas (10^7 - 10^8 celdas) repartiendo
+la ruta entre varios procesos. Como los autos no se pasan, cada proceso se
+queda con un bloque de autos consecutivos, que ocupa un tramo continuo de la
+ruta (el tramo se va corriendo con el transito). Las posiciones y
+velocidades de todos los autos estan en memoria compartida
+(multiprocessing.shared_memory) y lo unico que un proceso lee de otro es la
+posicion del primer auto del bloque siguiente, el de adelante de su ultimo
+auto: el borde entre tramos, que esta a lo sumo a V_max celdas de lo que
+ese auto puede alcanzar.
+
+Cada paso tiene dos fases separadas por barreras: primero todos calculan
+las velocidades nuevas de sus autos (leyendo posiciones), despues todos
+mueven sus autos. Cada proceso acumula la distancia recorrida por sus autos
+y al final se suman.
+
+Numeros aleatorios: el motor 'numpy' tira, en cada paso, k numeros seguidos
+del generador (PCG64). El proceso que tiene los autos a..b-1 salta hasta el
+numero a de cada paso con bit_generator.advance, tira los suyos y salta al
+paso siguiente, asi que usa exactamente los mismos numeros que ese auto en
+el motor 'numpy': los resultados son identicos a simulacion.Mediciones con
+motor='numpy', con cualquier cantidad de procesos.
+"""
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from simulacion import condicion_inicial, resumen
+
+
+def Dominios(M, N, V_max, k, p=0, semilla=None, procesos=None, N1=100):
+    """
+    Parametros:
+        M, N, V_max, k, p, semilla: como en simulacion.Mediciones
+        procesos: cantidad de procesos (por defecto, uno por nucleo)
+        N1: pasos de burn-in (aca no hay N1='auto')
+
+    Devuelve lo mismo que simulacion.Mediciones: un diccionario con flujo,
+    velocidad_media, distancias (por auto) y quemado.
+    """
+    if N1 == 'auto':
+        raise ValueError("N1='auto' no esta disponible en Dominios")
+    if procesos is None:
+        procesos=os.cpu_count() or 1
+    procesos=max(1, min(procesos, k))
+
+    # El estado inicial del generador, el mismo que usaria el motor 'numpy'
+    estado=np.random.default_rng(semilla).bit_generator.state
+
+    X0, V0 = condicion_inicial(M, k)
+    memorias=[]
+    try:
+        for inicial in (X0, V0, np.zeros(k,dtype=np.int64)):
+            memoria=shared_memory.SharedMemory(create=True, size=inicial.nbytes)
+            memorias.append(memoria)
+            np.ndarray(k,dtype=np.int64,buffer=memoria.buf)[:]=inicial
+        nombres=[memoria.name for memoria in memorias]
+
+        limites=np.linspace(0,k,procesos+1).astype(np.int64)
+        barrera=multiprocessing.Barrier(procesos)
+        trabajadores=[multiprocessing.Process(
+                          target=_trabajador,
+                          args=(nombres, M, N, V_max, k, p, estado,
+                                int(limites[w]), int(limites[w+1]), N1,
+                                barrera))
+                      for w in range(procesos)]
+        for t in trabajadores:
+            t.start()
+        for t in trabajadores:
+            t.join()
+        if any(t.exitcode!=0 for t in trabajadores):
+            raise RuntimeError("fallo un proceso de Dominios")
+
+        Distancias=np.ndarray(k,dtype=np.int64,buffer=memorias[2].buf).copy()
+    finally:
+        for memoria in memorias:
+            memoria.close()
+            memoria.unlink()
+
+    return resumen(Distancias, M, N, N1)
+
+
+def _trabajador(nombres, M, N, V_max, k, p, estado, a, b, N1, barrera):
+    """
+    Lo que corre cada proceso. Si algo falla rompe la barrera, para que los
+    demas procesos no se queden esperando.
+    """
+    memorias=[shared_memory.SharedMemory(name=nombre) for nombre in nombres]
+    try:
+        _simular_bloque([memoria.buf for memoria in memorias], M, N, V_max,
+                        k, p, estado, a, b, N1, barrera)
+    except BaseException:
+        barrera.abort()
+        raise
+    finally:
+        for memoria in memorias:
+            memoria.close()
+
+
+def _simular_bloque(buffers, M, N, V_max, k, p, estado, a, b, N1, barrera):
+    """
+    Simula los autos a..b-1 (N1+N pasos) y guarda en D lo que recorrieron
+    en los ultimos N.
+    """
+    X, V, D = (np.ndarray(k,dtype=np.int64,buffer=buf) for buf in buffers)
+    bg=np.random.PCG64()
+    bg.state=estado
+    rng=np.random.Generator(bg)
+    bg.advance(a)                       # Mi primer numero del primer paso
+
+    mis_X=X[a:b]
+    mis_V=V[a:b]
+    d=np.empty(b-a,dtype=np.int64)
+    Distancias=np.zeros(b-a,dtype=np.int64)
+    for t in range(N1+N):
+        # Fase 1: velocidades nuevas, leyendo las posiciones
+        mis_V+=1
+        np.minimum(mis_V,V_max,out=mis_V)
+
+        np.subtract(X[a+1:b],X[a:b-1],out=d[:-1])
+        d[-1]=X[b%k]-X[b-1]             # El de adelante, del otro bloque
+        d%=M
+        if k==1:
+            d[:]=M
+        d-=1
+        np.minimum(mis_V,d,out=mis_V)
+
+        if p!=0:
+            frena=rng.random(b-a)<p
+            mis_V-=frena&(mis_V>0)
+            bg.advance(k-(b-a))         # Los numeros de los demas autos
+        barrera.wait()
+
+        # Fase 2: muevo
+        mis_X+=mis_V
+        mis_X%=M
+        if t>=N1:
+            Distancias+=mis_V
+        barrera.wait()
+
+    D[a:b]=Distancias
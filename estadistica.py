@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+MODULO Estadistica
+Errores de medias temporales. El flujo paso a paso de una simulacion esta
+correlacionado en el tiempo (un embotellamiento dura muchos pasos), asi que
+el error de su media no es std/sqrt(N): hay que agrupar la serie en bloques
+mas largos que el tiempo de correlacion.
+
+Referencia: H. Flyvbjerg y H. G. Petersen, J. Chem. Phys. 91, 461 (1989).
+"""
+import numpy as np
+
+
+def error_lotes(serie, lotes=32):
+    """
+    Error estandar de la media por el metodo de medias por lotes: parte la
+    serie en `lotes` tramos iguales y usa la dispersion de sus medias.
+    """
+    x=np.asarray(serie,dtype=float)
+    largo=x.size//lotes
+    medias=x[:largo*lotes].reshape(lotes,largo).mean(axis=1)
+    return np.sqrt(medias.var(ddof=1)/lotes)
+
+
+def errores_bloques(serie, minimo=16):
+    """
+    El analisis de bloques de Flyvbjerg-Petersen: el error estandar de la
+    media estimado despues de promediar la serie de a pares 0, 1, 2, ...
+    veces, mientras queden al menos `minimo` bloques. Devuelve la lista de
+    errores y la de cuantos bloques habia en cada nivel.
+    """
+    x=np.asarray(serie,dtype=float)
+    errores=[]
+    bloques=[]
+    while x.size>=minimo:
+        errores.append(np.sqrt(x.var(ddof=1)/x.size))
+        bloques.append(x.size)
+        pares=x.size//2
+        x=(x[0:2*pares:2]+x[1:2*pares:2])/2
+    return errores, bloques
+
+
+def error_bloques(serie, minimo=16):
+    """
+    Error estandar de la media de una serie correlacionada. Los errores del
+    analisis de bloques crecen con el nivel hasta que los bloques son mas
+    largos que el tiempo de correlacion, y ahi se estabilizan: devuelve el
+    primero que no es superado por el siguiente mas alla de su propia
+    incerteza, 1/sqrt(2*(bloques-1)). Si nunca se estabiliza, el mayor.
+    """
+    errores, bloques = errores_bloques(serie, minimo)
+    if not errores:
+        return np.nan
+    for l in range(len(errores)-1):
+        incerteza=errores[l]/np.sqrt(2*(bloques[l]-1))
+        if errores[l+1]-errores[l]<=incerteza:
+            return errores[l]
+    return max(errores)
+
+
+def combinar(medias, errores, pesos):
+    """
+    Combina medias independientes (p. ej. de varias replicas) pesadas por
+    `pesos` (p. ej. sus pasos). Devuelve la media y su error estandar.
+    """
+    w=np.asarray(pesos,dtype=float)
+    w=w/w.sum()
+    media=np.sum(w*np.asarray(medias))
+    error=np.sqrt(np.sum((w*np.asarray(errores))**2))
+    return media, error
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+MODULO Multiespin
+Nagel-Schreckenberg con V_max=1 para muchas replicas a la vez, guardando una
+replica en cada bit ("multi-spin coding"). Con V_max=1 la velocidad no hace
+falta: en cada paso un auto avanza una celda si la de adelante esta libre y
+no frena al azar (probabilidad p), asi que el estado de una replica es solo
+la ocupacion de cada celda, un bit. La ruta se guarda como un array de M x W
+enteros de 64 bits: el bit j de la palabra (i, w) dice si la celda i de la
+replica 64*w+j esta ocupada, y cada paso son unas pocas operaciones logicas
+sobre el array, que avanzan las 64*W replicas juntas:
+
+    se_mueve = ocupada & ~ocupada_adelante & ~frena
+    ocupada = (ocupada & ~se_mueve) | se_mueve_atras
+
+Los frenos se arman bit a bit: un bit es 1 con probabilidad p si el numero
+uniforme U = 0.u1u2u3... (un bit aleatorio por palabra) es menor que
+p = 0.b1b2b3...; eso se decide en el primer bit en que difieren, asi que
+alcanza con una palabra aleatoria por cada bit de p hasta su ultimo 1 (una
+sola para p=0.5). p se redondea a `precision` bits.
+
+El flujo de cada replica sale de lo que avanzaron sus autos: la suma de las
+posiciones al final menos al principio, mas M por cada auto que paso de la
+celda M-1 a la 0 (que se cuentan en cada paso mirando una sola fila).
+"""
+import numpy as np
+
+
+BITS=64
+
+
+def MultiEspin(M, N, K, p=0, semilla=None, N1=100, precision=16):
+    """
+    Parametros:
+        M: cantidad de posiciones permitidas
+        N: total de pasos temporales
+        K: cantidad de autos de cada replica (un numero o uno por replica,
+            p. ej. np.arange(10,1000,10) para un diagrama fundamental)
+        p: probabilidad de frenado aleatorio, la misma para todas
+        semilla: para inicializar el random gen.
+        N1: pasos de burn-in
+        precision: bits con que se redondea p
+
+    Devuelve un array con el flujo de cada replica: la distancia total
+    recorrida por sus autos dividida por M*N.
+    """
+    K=np.atleast_1d(np.asarray(K,dtype=np.int64))
+    rng=np.random.default_rng(semilla)
+    bits=bits_de_p(p, precision)
+    ocupada=ocupacion_inicial(M, K)
+
+    #Burn-in
+    se_mueve=np.empty_like(ocupada)
+    for _ in range(N1):
+        paso_multiespin(ocupada, se_mueve, bits, rng)
+
+    #La simulacion real: N pasos, guardando quien pasa de M-1 a 0
+    inicio=suma_posiciones(ocupada, K.size)
+    vueltas=np.empty((N,ocupada.shape[1]),dtype=np.uint64)
+    for t in range(N):
+        paso_multiespin(ocupada, se_mueve, bits, rng)
+        vueltas[t]=se_mueve[-1]
+    final=suma_posiciones(ocupada, K.size)
+
+    cruces=desempacar(vueltas)[:,:K.size].sum(axis=0)
+    return (final-inicio+M*cruces)/(M*N)
+
+
+def bits_de_p(p, precision=16):
+    """
+    Los bits de la expansion binaria de p (redondeado a `precision` bits),
+    hasta el ultimo 1.
+    """
+    if not 0<=p<=1:
+        raise ValueError("p tiene que estar entre 0 y 1")
+    entero=int(round(p*2**precision))
+    if entero==2**precision:
+        return None                     # p=1: frenan todos siempre
+    bits=[(entero>>(precision-1-j))&1 for j in range(precision)]
+    while bits and bits[-1]==0:
+        bits.pop()
+    return bits
+
+
+def frenos(rng, forma, bits):
+    """
+    Palabras de 64 bits donde cada bit es 1 con probabilidad p, dados los
+    bits de p (ver bits_de_p).
+    """
+    if bits is None:
+        return np.full(forma, ~np.uint64(0))
+    frena=np.zeros(forma,dtype=np.uint64)
+    indeciso=np.full(forma, ~np.uint64(0))
+    n=int(np.prod(forma))
+    for b in bits:
+        u=rng.bit_generator.random_raw(n).reshape(forma)
+        if b:
+            frena|=indeciso&~u
+            indeciso&=u
+        else:
+            indeciso&=~u
+    return frena
+
+
+def paso_multiespin(ocupada, se_mueve, bits, rng):
+    """
+    Un paso temporal para todas las replicas. Actualiza ocupada en el lugar
+    y deja en se_mueve los autos que avanzaron.
+    """
+    # Se mueve el que tiene la celda de adelante libre y no frena
+    se_mueve[:-1]=ocupada[1:]
+    se_mueve[-1]=ocupada[0]
+    np.invert(se_mueve,out=se_mueve)
+    se_mueve&=ocupada
+    if bits:
+        se_mueve&=~frenos(rng, ocupada.shape, bits)
+    elif bits is None:
+        se_mueve[:]=0
+
+    # Muevo
+    ocupada&=~se_mueve
+    ocupada[1:]|=se_mueve[:-1]
+    ocupada[0]|=se_mueve[-1]
+
+
+def ocupacion_inicial(M, K):
+    """
+    Autos equiespaciados como en simulacion.condicion_inicial, con K[j]
+    autos en la replica j. Devuelve el array de M x W palabras.
+    """
+    W=-(-K.size//BITS)
+    ocupada=np.zeros((M,W*BITS),dtype=bool)
+    for j, k in enumerate(K):
+        ocupada[np.linspace(0,M-1,k,dtype=np.int64),j]=True
+    return empacar(ocupada)
+
+
+def empacar(celdas):
+    """
+    De un array de bool de M x 64W (celda, replica) a M x W palabras.
+    """
+    bytes_=np.packbits(celdas,axis=1,bitorder='little')
+    return bytes_.view('<u8').astype(np.uint64)
+
+
+def desempacar(palabras):
+    """
+    Lo contrario de empacar: de filas de W palabras a filas de 64W bool.
+    """
+    bytes_=np.ascontiguousarray(palabras,dtype='<u8').view(np.uint8)
+    return np.unpackbits(bytes_,axis=1,bitorder='little').astype(bool)
+
+
+def suma_posiciones(ocupada, R, filas=4096):
+    """
+    La suma de las posiciones de los autos de cada una de las R replicas.
+    """
+    suma=np.zeros(R,dtype=np.int64)
+    for a in range(0,ocupada.shape[0],filas):
+        celdas=desempacar(ocupada[a:a+filas])[:,:R]
+        suma+=np.arange(a,a+len(celdas))@celdas
+    return suma
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+MODULO Observables
+Calcula las magnitudes del diagrama fundamental a partir de las trayectorias
+que devuelve simulacion.Trafico (el array Pos de N filas, una por paso, y k
+columnas, una por auto), todo con operaciones sobre arrays. Tambien acepta
+un trayectorias.Trayectorias: se recorre de a bloques de filas, asi que no
+hace falta cargar la corrida entera en memoria.
+
+Lo que avanza el auto i entre los pasos t y t+1 es (Pos[t+1,i]-Pos[t,i])%M,
+asi que con N pasos guardados hay N-1 avances por auto. El flujo es la
+distancia total recorrida por (M * cantidad de avances), la densidad k/M.
+"""
+import numpy as np
+
+
+def bloques(Pos, filas=4096):
+    """
+    Recorre Pos de a bloques de `filas` filas, con una fila compartida entre
+    bloques seguidos para no perder el avance entre ellos.
+    """
+    N=len(Pos)
+    for a in range(0, max(N-1,1), filas):
+        yield np.asarray(Pos[a:min(a+filas+1,N)])
+
+
+def avances(Pos, M):
+    """
+    Lo que avanza cada auto en cada paso: array de N-1 x k.
+    """
+    return np.diff(np.asarray(Pos),axis=0)%M
+
+
+def distancias(Pos, M):
+    """
+    La distancia recorrida por cada auto.
+    """
+    return sum(avances(tramo, M).sum(axis=0) for tramo in bloques(Pos))
+
+
+def distancia_total(Pos, M):
+    """
+    La distancia recorrida por todos los autos.
+    """
+    return distancias(Pos, M).sum()
+
+
+def densidad(Pos, M):
+    """
+    Autos por posicion, k/M.
+    """
+    return Pos.shape[1]/M
+
+
+def flujo(Pos, M):
+    """
+    Distancia total / (M * cantidad de avances): el flujo promediado en el
+    espacio y en el tiempo.
+    """
+    return distancia_total(Pos, M)/(M*(len(Pos)-1))
+
+
+def velocidad_media(Pos, M):
+    """
+    La velocidad media de los autos: flujo/densidad.
+    """
+    return distancia_total(Pos, M)/(Pos.shape[1]*(len(Pos)-1))
+
+
+def flujo_temporal(Pos, M):
+    """
+    El flujo en cada paso (promediado sobre la ruta): array de N-1 valores.
+    Sirve para ver la relajacion o para estimar errores (modulo estadistica).
+    """
+    return np.concatenate([avances(tramo, M).sum(axis=1)
+                           for tramo in bloques(Pos)])/M
+
+
+def pasadas(Pos, M, sitio):
+    """
+    Cuantos autos pasan por la posicion `sitio` en cada paso: un auto que
+    avanza de x a x+a pasa si sitio esta en (x, x+a]. Array de N-1 valores.
+    """
+    cuenta=[]
+    for tramo in bloques(Pos):
+        a=avances(tramo, M)
+        cuenta.append((((sitio-tramo[:-1]-1)%M)<a).sum(axis=1))
+    return np.concatenate(cuenta)
+
+
+def flujo_local(Pos, M, sitio):
+    """
+    El flujo medido en un punto fijo de la ruta (autos que pasan por paso),
+    promediado en el tiempo, como lo mide un detector en la calle.
+    """
+    return pasadas(Pos, M, sitio).mean()
+
+
+def punto_diagrama(Pos, M):
+    """
+    El punto (densidad, flujo) del diagrama fundamental de una corrida.
+    """
+    return densidad(Pos, M), flujo(Pos, M)
+
+
+def diagrama(corridas, M):
+    """
+    Los puntos del diagrama fundamental de varias corridas (con distinta
+    cantidad de autos): devuelve los arrays de densidad y de flujo.
+    """
+    puntos=np.array([punto_diagrama(Pos, M) for Pos in corridas])
+    return puntos[:,0], puntos[:,1]
@@ -7,8 +7,8 @@ Created on Thu Jul 25 14:18:22 2024
 Nagel-Schreckenberg traffic model: algunas pruebas
 Voy a variar la velocidad máxima entre 1, 3 y 5, en los casos:
     1) Sin aleatoriedad: p=0
-    2) p=2: 50% frenado aleatorio
-    3) p=4: 25% frenado aleatorio
+    2) p=0.5: 50% frenado aleatorio
+    3) p=0.25: 25% frenado aleatorio
 
 Bibliografía:
     [1] https://arxiv.org/pdf/cond-mat/9902170
@@ -16,7 +16,9 @@ Bibliografía:
     [3] https://sci-hub.st/https://doi.org/10.1103/PhysRevE.51.2939
 """
 
-from simulacion import Trafico
+from simulacion import Trafico, Mediciones, semilla_punto
+from observables import distancia_total
+from diagramas import graficar
 from matplotlib import pyplot as plt
 from os import urandom
 from scipy.optimize import curve_fit
@@ -39,31 +41,18 @@ V_max = 5
 
 resultados = Trafico(largo, tiempos, V_max, autos, 0, semilla)
 
-x = np.arange(tiempos)
 plt.figure(figsize=(10,10))
-plt.plot(x,resultados,color='grey',marker='.',markersize=0.2, linestyle='')
-plt.xlabel('Tiempo')
-plt.ylabel('Distancia')
+graficar(resultados, largo)
 plt.show()
 
 # Diagrama fundamental con autos entre 20 y 1000: p=0, V_max=5
 Distancias_totales = []      # La distancia total en cada simulación
 for autos in np.arange(20,1020,20):
     # Hago una simulación y la guardo en corrida
-    corrida = Trafico(largo, tiempos, V_max, autos, 0, semilla + 2*autos)
+    corrida = Trafico(largo, tiempos, V_max, autos, 0, semilla_punto(semilla, autos))
     
-    distancia_corrida = 0        # La distancia total en la corrida
-    
-    for i in range(autos):       # será la suma sobre el total de cada auto     
-        total_cada_auto = 0
-        
-        for t in range(tiempos - 1):    # Calculo el avance del auto i y sumo 
-            variacion = (corrida[t+1,i] - corrida[t,i])%largo
-            total_cada_auto += variacion
-        
-        distancia_corrida += total_cada_auto
-    
-    Distancias_totales.append(distancia_corrida)
+    # La distancia total en la corrida: la suma de lo que avanza cada auto
+    Distancias_totales.append(distancia_total(corrida, largo))
 
 # Grafico el diagrama correspondiente:
 densidad = np.arange(20,1020,20)/largo
@@ -133,20 +122,10 @@ for velocidad in [1,3,5]:
     Distancias_totales = []      # La distancia total en cada simulación
     for autos in np.arange(20,1020,20):
         # Hago una simulación y la guardo en corrida
-        corrida = Trafico(largo, tiempos, V_max, autos, 0, semilla + 2*autos)
-        
-        distancia_corrida = 0        # La distancia total en la corrida
+        corrida = Trafico(largo, tiempos, V_max, autos, 0, semilla_punto(semilla, autos))
         
-        for i in range(autos):       # será la suma sobre el total de cada auto     
-            total_cada_auto = 0
-            
-            for t in range(tiempos - 1):    # Calculo el avance del auto i y sumo 
-                variacion = (corrida[t+1,i] - corrida[t,i])%largo
-                total_cada_auto += variacion
-            
-            distancia_corrida += total_cada_auto
-        
-        Distancias_totales.append(distancia_corrida)
+        # La distancia total en la corrida: la suma de lo que avanza cada auto
+        Distancias_totales.append(distancia_total(corrida, largo))
     
     # Calculo densidad y flujo para esa V_max:
     densidad = np.arange(20,1020,20)/largo
@@ -186,11 +165,11 @@ for velocidad in [1,3,5]:
 # Funciona, un lujo.
 
 """
-2) Caso con p=2: 50% probabilidad de frenado aleatorio
+2) Caso con p=0.5: 50% probabilidad de frenado aleatorio
 Voy a obtener el diagrama fundamental con distintas V_max. 
 """
 
-# Hagamos una prueba. Lo mismo de antes, pero ahora con p=2. Ya no tengo ajuste 
+# Hagamos una prueba. Lo mismo de antes, pero ahora con p=0.5. Ya no tengo ajuste 
 # para hacer, no hay resolución analítica.
 
 # Extraigo la semilla
@@ -200,24 +179,14 @@ largo = 1000    # Cantidad de posiciones permitidas
 tiempos = 1000    # Cantidad de pasos temporales
 V_max = 1
 
-# Diagrama fundamental con autos entre 20 y 1000: p=2, V_max=1
+# Diagrama fundamental con autos entre 20 y 1000: p=0.5, V_max=1
 Distancias_totales = []      # La distancia total en cada simulación
 for autos in np.arange(20,1020,20):
     # Hago una simulación y la guardo en corrida
-    corrida = Trafico(largo, tiempos, V_max, autos, 2, semilla + 2*autos)
-    
-    distancia_corrida = 0        # La distancia total en la corrida
+    corrida = Trafico(largo, tiempos, V_max, autos, 0.5, semilla_punto(semilla, autos))
     
-    for i in range(autos):       # será la suma sobre el total de cada auto     
-        total_cada_auto = 0
-        
-        for t in range(tiempos - 1):    # Calculo el avance del auto i y sumo 
-            variacion = (corrida[t+1,i] - corrida[t,i])%largo
-            total_cada_auto += variacion
-        
-        distancia_corrida += total_cada_auto
-    
-    Distancias_totales.append(distancia_corrida)
+    # La distancia total en la corrida: la suma de lo que avanza cada auto
+    Distancias_totales.append(distancia_total(corrida, largo))
 
 # Grafico el diagrama correspondiente:
 densidad = np.arange(20,1020,20)/largo
@@ -236,8 +205,8 @@ plt.legend(loc="upper right", fontsize=8)
 plt.show()
 
 # Voy a plotear en el mismo gráfico las simulaciones con V_max = 1,3,5, mante-
-# niendo p=2. Para que no explote, voy a calcular las distancias pero no voy
-# a guardar todos los datos de cada simulación.
+# niendo p=0.5. Para que no explote, uso Mediciones, que calcula las distancias
+# sin guardar todos los datos de cada simulación.
 
 Diagramas=[]     # Acá guardo los diagramas por cada velocidad:
                  # [[flujo_1, densidad_1], [flujo_2, densidad_2], ...]
@@ -246,30 +215,17 @@ for velocidad in [1,2,3]:
     tiempos = 1000     # Cantidad de pasos temporales
     V_max=velocidad
     
-    # Diagrama fundamental con autos entre 20 y 1000, p=2:
-    Distancias_totales = []      # La distancia total en cada simulación
+    # Diagrama fundamental con autos entre 20 y 1000, p=0.5:
+    flujo = []      # El flujo de cada simulación
     autos_totales = np.concatenate((np.arange(10,largo//(V_max+1),10),
                                     np.arange(largo//(V_max+1),1000,30)))
     for autos in autos_totales:
-        # Hago una simulación y la guardo en corrida
-        corrida = Trafico(largo, tiempos, V_max, autos, 2, semilla + 2*autos)
-        
-        distancia_corrida = 0        # La distancia total en la corrida
-        
-        for i in range(autos):       # será la suma sobre el total de cada auto     
-            total_cada_auto = 0
-            
-            for t in range(tiempos - 1):    # Calculo el avance del auto i y sumo 
-                variacion = (corrida[t+1,i] - corrida[t,i])%largo
-                total_cada_auto += variacion
-            
-            distancia_corrida += total_cada_auto
-        
-        Distancias_totales.append(distancia_corrida)
+        # Hago una simulación que solo acumula lo que avanza cada auto
+        corrida = Mediciones(largo, tiempos, V_max, autos, 0.5, semilla_punto(semilla, autos))
+        flujo.append(corrida['flujo'])
     
-    # Calculo densidad y flujo para esa V_max:
+    # Calculo la densidad para esa V_max:
     densidad = autos_totales/largo
-    flujo = [i/(largo*tiempos) for i in Distancias_totales]
     
     # Los guardo el Diagramas:
     Diagramas.append([flujo, densidad])
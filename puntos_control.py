@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+MODULO Puntos de control
+Guarda y lee el estado de una simulacion larga a mitad de camino, para poder
+seguirla si el proceso se corta. El estado es todo lo que hace falta para
+que la corrida siga exactamente igual: posiciones, velocidades, el paso en
+que iba, lo acumulado hasta ahi y el estado del generador de numeros
+aleatorios (el del np.random.Generator y los numeros que le quedaban en el
+buffer a simulacion.Uniformes).
+
+Cada punto de control es un .npz que se escribe con otro nombre y se
+renombra al final (os.replace es atomico), asi que si el proceso se corta
+mientras escribe queda el punto de control anterior entero.
+"""
+import json
+import os
+import tempfile
+
+import numpy as np
+
+
+def guardar(archivo, parametros, rng, **datos):
+    """
+    Guarda un punto de control.
+
+    Parametros:
+        archivo: el .npz donde se guarda
+        parametros: diccionario con los parametros de la corrida (M, N, ...);
+            al leer se verifica que sean los mismos
+        rng: el simulacion.Uniformes de la corrida
+        datos: los arrays y numeros del estado (X, V, t, ...)
+    """
+    estado, buffer = rng.estado()
+    escribir_atomico(archivo, lambda f: np.savez(
+        f, parametros=json.dumps(parametros, sort_keys=True),
+        rng=json.dumps(estado), buffer=buffer, **datos))
+
+
+def escribir_atomico(archivo, escribir):
+    """
+    Escribe `archivo` sin que nunca se pueda leer a medio escribir:
+    escribir(f) escribe en un temporal de la misma carpeta, que despues se
+    renombra (os.replace es atomico). Si algo falla se borra el temporal y
+    queda el archivo anterior. Devuelve el tamano escrito, en bytes.
+    """
+    carpeta=os.path.dirname(os.path.abspath(archivo))
+    descriptor, temporal = tempfile.mkstemp(dir=carpeta, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as f:
+            escribir(f)
+            tamano=f.tell()
+        os.replace(temporal, archivo)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return tamano
+
+
+def leer(archivo, parametros, rng):
+    """
+    Lee un punto de control y deja a rng (un simulacion.Uniformes) en el
+    estado en que estaba. Devuelve un diccionario con los datos guardados,
+    o None si el archivo no existe.
+    """
+    try:
+        datos=np.load(archivo)
+    except FileNotFoundError:
+        return None
+    with datos:
+        guardados=json.loads(datos['parametros'].item())
+        if guardados!=json.loads(json.dumps(parametros, sort_keys=True)):
+            raise ValueError("el punto de control {} es de otra corrida: {}"
+                             .format(archivo, guardados))
+        rng.restaurar(json.loads(datos['rng'].item()), datos['buffer'])
+        return {k: (datos[k].item() if datos[k].ndim==0 else datos[k])
+                for k in datos.files if k not in ('parametros','rng','buffer')}
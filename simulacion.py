@@ -10,74 +10,1321 @@ MODULO Simulacion
 Contiene funciones que realizan simulaciones. Se importan las que se necesiten
 y se pueden realizar varias simulaciones cambiando los parametros.
 """
+import functools
+import hashlib
+import time
+
 import numpy as np
-from random import seed, randint
+from random import seed, random
+
+import puntos_control
+from estadistica import error_bloques, combinar
+from trayectorias import Escritor, Trayectorias
+
+# Version de los motores: cambia cuando una misma llamada (mismos parametros y
+# semilla) deja de dar el mismo resultado. La usa el modulo cache.
+VERSION_MOTOR=3
 
 
 """
 1)
 Modelo de trafico: Nagel-Schreckenberg traffic model
 Se tiene una calle de una sola mano, con condiciones periodicas (ruta
-circular). Hay M posiciones sobre la ruta y k<M autos, probabilidad 1/3 
-de que los coches se frenen
+circular). Hay M posiciones sobre la ruta y k<M autos, y cada auto frena
+aleatoriamente con probabilidad p.
 
 Parametros:
-    V_max: la velocidad maxima
-    k: cantidad de autos
     M: cantidad de posiciones permitidas
     N: total de pasos temporales
-    semilla: para inicializar el random gen.
+    V_max: la velocidad maxima
+    k: cantidad de autos
+    p: probabilidad de frenado aleatorio, 0<=p<=1
+    semilla: para inicializar el random gen.: un entero, una
+        np.random.SeedSequence o directamente un np.random.Generator
+    motor: 'auto' (por defecto: 'red' si la ruta es larga y esta casi
+        llena, si no 'numpy'), 'numpy' (todos los autos a la vez), 'red'
+        (la ruta como un array de M celdas, conviene en los embotellamientos),
+        'numba' (el loop auto por auto compilado con numba; da exactamente lo
+        mismo que 'numpy') o 'python' (un loop auto por auto en Python puro,
+        con el modulo random, como referencia)
+    archivo: si se da una carpeta, las trayectorias se van guardando ahi en
+        vez de en memoria (ver el modulo trayectorias)
+    delta: con archivo, guarda lo que avanza cada auto en lugar de las
+        posiciones (ocupa menos)
+    N1: pasos de burn-in antes de empezar a guardar. Con N1='auto' se corre
+        hasta que el flujo es estacionario (ver quemado_adaptativo); no
+        disponible con motor='python'.
+    perfil: un Perfil donde anotar el tiempo de cada fase del paso y cuantos
+        autos frenan (solo motores 'numpy' y 'red')
+    observador: una funcion observador(t, X, V) que se llama cada `cada`
+        pasos de la simulacion real con el paso t (de 1 a N) y las
+        posiciones y velocidades de los autos, que no se deben modificar
+        (solo motores 'numpy' y 'red'; con p=0 no se saltea el ciclo)
+
+Devuelve un array de N filas y k columnas: la fila t tiene las posiciones
+de los k autos en el paso t. Con p=0 y motor='numpy', cuando la dinamica se
+vuelve periodica el resto de las filas se completa sin simular. Con archivo
+devuelve un trayectorias.Trayectorias, que se indexa igual pero lee del
+disco.
+"""
+
+def Trafico(M, N, V_max, k, p=0, semilla=None, motor='auto', archivo=None,
+            delta=False, N1=100, perfil=None, observador=None, cada=1):
+    validar_p(p)
+    if motor == 'auto':
+        motor=elegir_motor(M, k, V_max)
+    if motor == 'numpy':
+        return _Trafico_numpy(M, N, V_max, k, p, semilla, archivo, delta, N1,
+                              perfil, observador, cada)
+    if motor == 'red':
+        return _Trafico_red(M, N, V_max, k, p, semilla, archivo, delta, N1,
+                            perfil, observador, cada)
+    if archivo is not None:
+        raise ValueError("archivo solo se puede usar con motor='numpy' o 'red'")
+    if perfil is not None or observador is not None:
+        raise ValueError("perfil y observador solo se pueden usar con "
+                         "motor='numpy' o 'red'")
+    if motor == 'numba':
+        return _Trafico_numba(M, N, V_max, k, p, semilla, N1)
+    if motor == 'python':
+        if N1 == 'auto':
+            raise ValueError("N1='auto' no esta disponible con motor='python'")
+        return _Trafico_python(M, N, V_max, k, p, semilla, N1)
+    raise ValueError("motor desconocido: {}".format(motor))
+
+
+def validar_p(p):
+    """
+    Controla que p (un numero o uno por replica) este entre 0 y 1. Fuera
+    de ese rango la simulacion no falla sola: con p>1, por ejemplo, frenan
+    todos siempre y da flujo 0 sin avisar.
+    """
+    p=np.asarray(p,dtype=float)
+    if not ((0<=p)&(p<=1)).all():
+        raise ValueError("p tiene que estar entre 0 y 1")
+
+
+# A partir de que densidad y largo de ruta conviene el motor 'red', y la
+# maxima velocidad que admite (las velocidades se guardan en un byte)
+DENSIDAD_RED=0.8
+LARGO_RED=10**4
+V_MAX_RED=np.iinfo(np.int8).max
+
+def elegir_motor(M, k, V_max):
+    """
+    El motor de 'auto': con la ruta como lista de posiciones cada paso cuesta
+    O(k); como array de celdas cuesta O(M) operaciones sobre bytes, mas
+    O(autos en movimiento). Lo segundo gana cuando la ruta es larga y esta
+    casi llena (casi todos los autos parados), si V_max entra en un byte.
+    """
+    if M>=LARGO_RED and k>=DENSIDAD_RED*M and V_max<=V_MAX_RED:
+        return 'red'
+    return 'numpy'
+
+
+def quemar(N1, avanzar, M, k, ventana=25):
+    """
+    El burn-in: llama N1 veces a avanzar(), que hace un paso temporal y
+    devuelve lo que avanzaron todos los autos en ese paso. Con N1='auto'
+    usa quemado_adaptativo, con esa `ventana`. Devuelve la cantidad de pasos
+    que hizo.
+    """
+    if N1 == 'auto':
+        return quemado_adaptativo(avanzar, M, k, ventana)
+    for _ in range(N1):
+        avanzar()
+    return N1
+
+
+def quemado_adaptativo(avanzar, M, k, ventana=25, maximo=100000, z=2,
+                       tolerancia=0.03, piso=30):
+    """
+    Burn-in adaptativo: avanza guardando el flujo de cada paso hasta que la
+    segunda mitad de lo corrido es estacionaria. Para eso parte la segunda
+    mitad en dos ventanas (de al menos `ventana` pasos cada una, no menos de
+    16, y que van creciendo con lo corrido) y compara sus medias, con el
+    error de cada una por analisis de bloques (el flujo esta correlacionado
+    en el tiempo, ver el modulo estadistica). Se corta cuando la diferencia
+    es menor que z errores estandar y ademas esos z errores son menos que
+    `tolerancia` del flujo: si las ventanas son tan ruidosas que no se veria
+    una tendencia de ese tamano, se sigue. Asi las relajaciones lentas
+    corren mas pasos, y las que ya son estacionarias (p. ej. p=0 a baja
+    densidad) cortan a los 4*ventana pasos.
+
+    El flujo total fluctua como la raiz de los autos (o de los huecos, si
+    hay menos) que se mueven, asi que en rutas chicas o cerca de la ruta
+    vacia o llena no se puede pedir precision relativa al flujo: la
+    tolerancia se toma respecto de max(flujo, piso*sqrt(min(k, M-k))), que
+    se alcanza en unos cientos de pasos aunque el flujo sea chico. Si no se
+    estaciona, corta a los `maximo` pasos.
+
+    Devuelve la cantidad de pasos que hizo.
+    """
+    referencia=piso*np.sqrt(min(k, M-k))
+    serie=np.empty(maximo)
+    pasos=0
+    proximo=4*max(ventana,16)
+    while pasos<maximo:
+        serie[pasos]=avanzar()
+        pasos+=1
+        if pasos<proximo:
+            continue
+        # Pruebo de nuevo cuando lo corrido crece un 5%
+        proximo=max(pasos+10,int(pasos*1.05))
+        n=pasos
+        if estacionario(serie[n//2:3*n//4], serie[3*n//4:n], z, tolerancia,
+                        referencia):
+            break
+    return pasos
+
+
+def estacionario(a, b, z=2, tolerancia=0.03, referencia=0):
+    """
+    Compara las medias de dos ventanas de una serie correlacionada: True si
+    difieren en menos de z errores estandar (por analisis de bloques) y esos
+    z errores son menos que `tolerancia` de la media (o de `referencia`, si
+    es mayor).
+    """
+    diferencia=abs(a.mean()-b.mean())
+    error=np.hypot(error_bloques(a),error_bloques(b))
+    media=(a.sum()+b.sum())/(a.size+b.size)
+    return (diferencia<=z*error
+            and z*error<=tolerancia*max(media, referencia))
+
+
+class Uniformes:
+    """
+    Numeros aleatorios uniformes en [0,1) sacados de a bloques de un
+    np.random.Generator. random(n) devuelve los n siguientes: son los mismos
+    que daria rng.random(n) llamado paso a paso, pero se generan de a
+    `bloque` por vez (p. ej. 64 pasos x k autos), que es mucho mas rapido
+    cuando k es chico.
+    """
+
+    def __init__(self, rng, bloque=2**16):
+        self.rng=rng
+        self.bloque=bloque
+        self._buffer=np.empty(0)
+        self._i=0
+
+    def random(self, n):
+        i=self._i
+        if i+n>self._buffer.size:
+            resto=self._buffer[i:]
+            nuevos=self.rng.random(max(self.bloque,n-resto.size))
+            self._buffer=np.concatenate((resto,nuevos))
+            i=0
+        self._i=i+n
+        return self._buffer[i:i+n]
+
+    def estado(self):
+        """
+        El estado del generador y los numeros que quedan en el buffer: con
+        eso restaurar() sigue dando exactamente los mismos numeros.
+        """
+        return self.rng.bit_generator.state, self._buffer[self._i:].copy()
+
+    def restaurar(self, estado, buffer):
+        self.rng.bit_generator.state=estado
+        self._buffer=np.array(buffer,dtype=float)
+        self._i=0
+
+
+def uniformes(semilla, k):
+    """
+    El generador de los motores: un Uniformes sobre np.random.default_rng
+    (semilla puede ser un entero, una SeedSequence o un Generator), con
+    bloques de 64 pasos de k autos (entre 2**12 y 2**22 numeros).
+    """
+    bloque=min(max(64*k,2**12),2**22)
+    return Uniformes(np.random.default_rng(semilla), bloque)
+
+
+def semilla_punto(semilla, *parametros):
+    """
+    Una semilla independiente para cada punto de un barrido: la
+    SeedSequence hija de `semilla` identificada por los parametros enteros
+    del punto (p. ej. semilla_punto(semilla, autos)). Siempre es la misma
+    para el mismo punto, sin importar el orden ni en que proceso se corra.
+    Los parametros que no son enteros (como p) se identifican por sus bits.
+    """
+    clave=tuple(int(x) if float(x).is_integer() else
+                int(np.float64(x).view(np.uint64)) for x in parametros)
+    return np.random.SeedSequence(semilla, spawn_key=clave)
+
+
+def identificar_semilla(semilla):
+    """
+    Lo que identifica a una semilla (para la clave del modulo cache y los
+    puntos de control): el entero, o la entropia y la spawn_key de una
+    SeedSequence. None si no es reproducible (None o un Generator).
+    """
+    if isinstance(semilla, (int, np.integer)):
+        return int(semilla)
+    if (isinstance(semilla, np.random.SeedSequence)
+            and semilla.entropy is not None):
+        return [str(semilla.entropy), list(semilla.spawn_key)]
+    return None
+
+
+def condicion_inicial(M, k):
+    """
+    Autos equiespaciados (salvo el primero y el ultimo) y en reposo.
+    """
+    X=np.linspace(0,M-1,k,dtype=np.int64)
+    V=np.zeros(k,dtype=np.int64)
+    return X, V
+
+
+def distancias(X, M):
+    """
+    Distancia de cada auto al de adelante, con las cond. de contorno
+    periodicas. Los autos no se pasan, asi que el de adelante del auto i es
+    siempre el i+1 (y el del ultimo es el primero).
+    """
+    d=np.empty_like(X)
+    d[:-1]=X[1:]-X[:-1]
+    d[-1]=X[0]-X[-1]
+    d%=M
+    if X.size==1:                       # Un solo auto: tiene toda la ruta
+        d[:]=M
+    return d
+
+
+def paso(X, V, M, V_max, p, rng):
+    """
+    Un paso temporal de Nagel-Schreckenberg para todos los autos a la vez.
+    Actualiza X y V en el lugar.
+    """
+    # Acelero
+    V+=1
+    np.minimum(V,V_max,out=V)
+
+    # Freno si choco con el de adelante
+    np.minimum(V,distancias(X,M)-1,out=V)
+
+    # Frenado aleatorio con probabilidad p
+    if p!=0:
+        frena=rng.random(V.size)<p
+        V-=frena&(V>0)
+
+    # Muevo
+    X+=V
+    X%=M
+
+
+"""
+Instrumentacion: con un Perfil los motores 'numpy' y 'red' usan una version
+del paso que toma el tiempo de cada fase y cuenta los autos que frenan. El
+paso se elige una sola vez al empezar la corrida, asi que sin Perfil se
+corre el paso de siempre, sin ningun costo extra.
+"""
+
+FASES=('acelerar', 'distancia', 'aleatorio', 'mover', 'guardar')
+
+class Perfil:
+    """
+    Tiempos y cuentas de una o varias corridas (se van acumulando).
+
+    Atributos:
+        tiempos: segundos en cada fase: 'acelerar', 'distancia' (frenar por
+            el de adelante), 'aleatorio', 'mover' y 'guardar' (lo que se hace
+            fuera del paso durante la simulacion real: guardar posiciones o
+            distancias, hashes del ciclo, el observador)
+        pasos: pasos temporales hechos, burn-in incluido
+        frenados_distancia: autos que frenaron por el de adelante
+        frenados_aleatorio: autos que frenaron al azar
+    """
+
+    def __init__(self):
+        self.tiempos=dict.fromkeys(FASES, 0.0)
+        self.pasos=0
+        self.frenados_distancia=0
+        self.frenados_aleatorio=0
+        self._inicio=None
+        self._en_fases=0.0
+
+    def anotar(self, t0, t1, t2, t3, t4):
+        """
+        Suma los tiempos de las cuatro fases de un paso.
+        """
+        self.tiempos['acelerar']+=t1-t0
+        self.tiempos['distancia']+=t2-t1
+        self.tiempos['aleatorio']+=t3-t2
+        self.tiempos['mover']+=t4-t3
+        self.pasos+=1
+
+    def _fases(self):
+        return sum(self.tiempos[f] for f in FASES[:-1])
+
+    def empezar(self):
+        """
+        Marca el comienzo de la simulacion real.
+        """
+        self._inicio=time.perf_counter()
+        self._en_fases=self._fases()
+
+    def terminar(self):
+        """
+        Marca el final: lo que no se paso en el paso va a 'guardar'.
+        """
+        total=time.perf_counter()-self._inicio
+        self.tiempos['guardar']+=total-(self._fases()-self._en_fases)
+
+    def __str__(self):
+        total=sum(self.tiempos.values()) or 1
+        lineas=["{:>10}: {:10.4f} s ({:5.1%})".format(f, self.tiempos[f],
+                                                     self.tiempos[f]/total)
+                for f in FASES]
+        lineas.append("pasos: {}, frenados por distancia: {}, al azar: {}"
+                      .format(self.pasos, self.frenados_distancia,
+                              self.frenados_aleatorio))
+        return "\n".join(lineas)
+
+
+def paso_perfilado(X, V, M, V_max, p, rng, perfil):
+    """
+    Igual que paso (tira los mismos numeros aleatorios y da lo mismo), pero
+    anota en perfil el tiempo de cada fase y los autos que frenan.
+    """
+    reloj=time.perf_counter
+    t0=reloj()
+    V+=1
+    np.minimum(V,V_max,out=V)
+
+    t1=reloj()
+    d=distancias(X,M)-1
+    perfil.frenados_distancia+=int(np.count_nonzero(V>d))
+    np.minimum(V,d,out=V)
+
+    t2=reloj()
+    if p!=0:
+        frena=rng.random(V.size)<p
+        frena&=V>0
+        perfil.frenados_aleatorio+=int(np.count_nonzero(frena))
+        V-=frena
+
+    t3=reloj()
+    X+=V
+    X%=M
+    perfil.anotar(t0, t1, t2, t3, reloj())
+
+
+def _Trafico_numpy(M, N, V_max, k, p, semilla, archivo=None, delta=False,
+                   N1=100, perfil=None, observador=None, cada=1):
+    rng=uniformes(semilla, k)
+    X, V = condicion_inicial(M, k)
+    if perfil is None:
+        dar_paso=paso
+    else:
+        dar_paso=functools.partial(paso_perfilado, perfil=perfil)
+
+    #Burn-in
+    def avanzar():
+        dar_paso(X, V, M, V_max, p, rng)
+        return V.sum()
+    quemar(N1, avanzar, M, k)
+
+    #La simulacion real: N pasos
+    if perfil is not None:
+        perfil.empezar()
+    if archivo is not None:
+        with Escritor(archivo, M, N, k, V_max, delta=delta) as escritor:
+            for j in range(N):
+                dar_paso(X, V, M, V_max, p, rng)
+                escritor.agregar(X, V)
+                if observador is not None and (j+1)%cada==0:
+                    observador(j+1, X, V)
+        if perfil is not None:
+            perfil.terminar()
+        return Trayectorias(archivo)
+
+    Pos=np.empty((N,k),dtype=np.int64)
+    vistos={}
+    for j in range(N):
+        dar_paso(X, V, M, V_max, p, rng)
+        Pos[j,:]=X
+        if observador is not None:
+            if (j+1)%cada==0:
+                observador(j+1, X, V)
+            continue
+
+        # Sin aleatoriedad, si el estado se repite el resto es periodico
+        if p==0:
+            h=huella(X, V, M)
+            if h in vistos:
+                repetir_ciclo(Pos, j, j-vistos[h], M)
+                break
+            vistos[h]=j
+
+    if perfil is not None:
+        perfil.terminar()
+    return Pos
+
+
+"""
+Con p=0 el modelo es determinista: si el estado (las distancias entre autos
+y sus velocidades, sin importar donde esta el primero) se repite despues de
+T pasos, desde ahi todo se repite con periodo T, corrido en lo que avanzo
+cada auto en ese periodo. Guardando un hash del estado en cada paso se
+detecta el ciclo y el resto de la corrida se calcula sin simular.
+"""
+
+def huella(X, V, M):
+    """
+    Hash del estado, relativo a su propia rotacion: distancias y velocidades.
+    """
+    datos=distancias(X, M).tobytes()+V.tobytes()
+    return hashlib.blake2b(datos, digest_size=16).digest()
+
+
+def repetir_ciclo(Pos, j, T, M):
+    """
+    Completa Pos desde la fila j+1 sabiendo que el estado de la fila j es el
+    de la fila j-T corrido: cada fila es la de T pasos antes mas lo que
+    avanzo cada auto en un periodo.
+    """
+    corrimiento=Pos[j]-Pos[j-T]
+    for a in range(j+1,len(Pos),T):
+        b=min(a+T,len(Pos))
+        Pos[a:b]=(Pos[a-T:b-T]+corrimiento)%M
+
+
+def medir(N, k, avanzar, huella=None, control=None, desde=0,
+          Distancias=None):
+    """
+    Hace N pasos llamando a avanzar(), que devuelve que autos avanzaron y
+    cuanto, y devuelve la distancia recorrida por cada auto. Si se da
+    huella() (el hash del estado actual, solo tiene sentido con p=0), al
+    repetirse un estado mide un periodo mas y multiplica en vez de simular
+    el resto. Para no guardar un hash por paso se usa el algoritmo de
+    Brent: se guarda un solo estado y se reemplaza cada vez que los pasos
+    desde que se guardo llegan a una potencia de 2; cuando se repite, esa
+    distancia es el periodo exacto. El costo es el transitorio y a lo sumo
+    unos pocos periodos mas, con memoria fija.
+
+    Para seguir una corrida cortada: `desde` es el paso en que iba y
+    Distancias lo que llevaba acumulado. Si se da control(t, Distancias),
+    se llama despues de cada paso simulado uno por uno.
+    """
+    if Distancias is None:
+        Distancias=np.zeros(k,dtype=np.int64)
+    # El estado guardado, el paso en que se guardo y cuantos pasos se
+    # espera antes de reemplazarlo
+    guardado, cuando, potencia = None, desde, 1
+    t=desde
+    while t<N:
+        quien, avance = avanzar()
+        Distancias[quien]+=avance
+        t+=1
+        if control is not None:
+            control(t, Distancias)
+        if huella is None:
+            continue
+
+        h=huella()
+        if h!=guardado:
+            if t-cuando>=potencia:
+                guardado, cuando = h, t
+                potencia*=2
+            continue
+
+        # Se repitio: mido un periodo entero (o lo que quede)
+        T=t-cuando
+        Periodo=np.zeros(k,dtype=np.int64)
+        for _ in range(min(T,N-t)):
+            quien, avance = avanzar()
+            Periodo[quien]+=avance
+        Distancias+=Periodo
+        t+=min(T,N-t)
+
+        # Las vueltas enteras que faltan, y el resto paso a paso
+        vueltas, resto = divmod(N-t, T)
+        Distancias+=vueltas*Periodo
+        for _ in range(resto):
+            quien, avance = avanzar()
+            Distancias[quien]+=avance
+        break
+
+    return Distancias
+
 
-Devuelve un array de k listas, una por cada auto, con las N posiciones
-que alcanzan en cada iteracion: [[Auto1],[Auto2],...,[Autok]]
 """
+La ruta como array de celdas: en lugar de las posiciones de los k autos se
+guarda, para cada una de las M celdas, si esta ocupada, la velocidad del auto
+que esta ahi (0 si esta vacia) y su numero de auto (-1 si esta vacia). Las
+distancias se miran celda por celda hasta V_max adelante, y solo se mueven
+(y solo tiran numeros aleatorios) los autos con velocidad > 0, asi que en un
+embotellamiento casi todo el paso son operaciones sobre bytes.
+"""
+
+def a_red(X, V, M, V_max):
+    """
+    Pasa de posiciones y velocidades por auto a arrays por celda.
+    """
+    if V_max>V_MAX_RED:
+        raise ValueError("el motor 'red' admite V_max hasta {}"
+                         .format(V_MAX_RED))
+    ocupado=np.zeros(M,dtype=bool)
+    vel=np.zeros(M,dtype=np.int8)
+    auto=np.full(M,-1,dtype=np.int64)
+    ocupado[X]=True
+    vel[X]=V
+    auto[X]=np.arange(X.size)
+    return ocupado, vel, auto
+
+
+def de_red(ocupado, vel, auto, X, V):
+    """
+    Lo contrario de a_red: llena X y V (ordenados por auto) desde la red.
+    """
+    sitios=np.flatnonzero(ocupado)
+    X[auto[sitios]]=sitios
+    V[auto[sitios]]=vel[sitios]
+
+
+def _adelante(a, s, out):
+    """
+    out[i] = a[(i+s)%M], sin alocar.
+    """
+    out[:-s]=a[s:]
+    out[-s:]=a[:s]
+    return out
+
+
+def paso_red(ocupado, vel, auto, M, V_max, p, rng):
+    """
+    Un paso temporal sobre la red. Actualiza ocupado, vel y auto en el
+    lugar y devuelve los numeros de los autos que se movieron y cuanto
+    avanzo cada uno.
+    """
+    # Acelero
+    vel+=ocupado
+    np.minimum(vel,V_max,out=vel)
+
+    # Freno si choco con el de adelante: cuento cuantas celdas seguidas hay
+    # libres adelante, hasta V_max.
+    libre=~ocupado
+    seguido=_adelante(libre,1,np.empty(M,dtype=bool))
+    hueco=seguido.view(np.int8).copy()
+    temp=np.empty(M,dtype=bool)
+    for s in range(2,V_max+1):
+        seguido&=_adelante(libre,s,temp)
+        hueco+=seguido
+    np.minimum(vel,hueco,out=vel)
+
+    # Frenado aleatorio con probabilidad p, solo para los que se mueven
+    moviles=np.flatnonzero(vel)
+    if p!=0 and moviles.size:
+        vel[moviles]-=rng.random(moviles.size)<p
+        moviles=moviles[vel[moviles]>0]
+
+    # Muevo
+    avance=vel[moviles]
+    quien=auto[moviles]
+    ocupado[moviles]=False
+    vel[moviles]=0
+    auto[moviles]=-1
+    destino=moviles+avance
+    destino[destino>=M]-=M
+    ocupado[destino]=True
+    vel[destino]=avance
+    auto[destino]=quien
+
+    return quien, avance
+
+
+def paso_red_perfilado(ocupado, vel, auto, M, V_max, p, rng, perfil):
+    """
+    Igual que paso_red, pero anotando en perfil el tiempo de cada fase y los
+    autos que frenan.
+    """
+    reloj=time.perf_counter
+    t0=reloj()
+    vel+=ocupado
+    np.minimum(vel,V_max,out=vel)
+
+    t1=reloj()
+    libre=~ocupado
+    seguido=_adelante(libre,1,np.empty(M,dtype=bool))
+    hueco=seguido.view(np.int8).copy()
+    temp=np.empty(M,dtype=bool)
+    for s in range(2,V_max+1):
+        seguido&=_adelante(libre,s,temp)
+        hueco+=seguido
+    perfil.frenados_distancia+=int(np.count_nonzero(vel>hueco))
+    np.minimum(vel,hueco,out=vel)
 
-def Trafico(M, N, V_max, k, semilla):
+    t2=reloj()
+    moviles=np.flatnonzero(vel)
+    if p!=0 and moviles.size:
+        frena=rng.random(moviles.size)<p
+        perfil.frenados_aleatorio+=int(np.count_nonzero(frena))
+        vel[moviles]-=frena
+        moviles=moviles[vel[moviles]>0]
+
+    t3=reloj()
+    avance=vel[moviles]
+    quien=auto[moviles]
+    ocupado[moviles]=False
+    vel[moviles]=0
+    auto[moviles]=-1
+    destino=moviles+avance
+    destino[destino>=M]-=M
+    ocupado[destino]=True
+    vel[destino]=avance
+    auto[destino]=quien
+    perfil.anotar(t0, t1, t2, t3, reloj())
+
+    return quien, avance
+
+
+def _Trafico_red(M, N, V_max, k, p, semilla, archivo=None, delta=False,
+                 N1=100, perfil=None, observador=None, cada=1):
+    rng=uniformes(semilla, k)
+    X, V = condicion_inicial(M, k)
+    ocupado, vel, auto = a_red(X, V, M, V_max)
+    if perfil is None:
+        dar_paso=paso_red
+    else:
+        dar_paso=functools.partial(paso_red_perfilado, perfil=perfil)
+
+    #Burn-in
+    def avanzar():
+        return dar_paso(ocupado, vel, auto, M, V_max, p, rng)[1].sum()
+    quemar(N1, avanzar, M, k)
+
+    #La simulacion real: N pasos
+    if perfil is not None:
+        perfil.empezar()
+    if archivo is not None:
+        with Escritor(archivo, M, N, k, V_max, delta=delta) as escritor:
+            for j in range(N):
+                dar_paso(ocupado, vel, auto, M, V_max, p, rng)
+                de_red(ocupado, vel, auto, X, V)
+                escritor.agregar(X, V)
+                if observador is not None and (j+1)%cada==0:
+                    observador(j+1, X, V)
+        if perfil is not None:
+            perfil.terminar()
+        return Trayectorias(archivo)
+
+    Pos=np.empty((N,k),dtype=np.int64)
+    for j in range(N):
+        dar_paso(ocupado, vel, auto, M, V_max, p, rng)
+        de_red(ocupado, vel, auto, Pos[j], V)
+        if observador is not None and (j+1)%cada==0:
+            observador(j+1, Pos[j], V)
+
+    if perfil is not None:
+        perfil.terminar()
+    return Pos
+
+
+def _bucle(X, V, M, V_max, p, rng, pasos, Pos):
+    """
+    El loop auto por auto, escrito para que lo compile numba. Hace `pasos`
+    pasos temporales y, si Pos tiene filas, guarda ahi las posiciones. Tira
+    un numero aleatorio por auto en el mismo orden que paso, asi que con el
+    mismo rng da las mismas trayectorias que el motor 'numpy'.
+    """
+    k=X.size
+    for t in range(pasos):
+        for i in range(k):
+            if V[i]<V_max:
+                V[i]=V[i]+1
+
+            d=(X[(i+1)%k]-X[i])%M
+            if k==1:
+                d=M
+            if V[i]>=d:
+                V[i]=d-1
+
+            if p!=0:
+                if rng.random()<p:
+                    V[i]=max(V[i]-1,0)
+
+        for i in range(k):
+            X[i]=(X[i]+V[i])%M
+
+        if Pos.shape[0]>0:
+            Pos[t,:]=X
+
+
+_bucle_compilado=None
+
+def bucle_compilado():
+    """
+    Devuelve _bucle compilado con numba (se compila la primera vez), o _bucle
+    tal cual si numba no esta instalado (lento, pero da lo mismo). Numba se
+    importa recien aca, para que los demas motores no lo carguen.
+    """
+    global _bucle_compilado
+    if _bucle_compilado is None:
+        try:
+            from numba import njit
+        except ImportError:
+            _bucle_compilado=_bucle
+        else:
+            _bucle_compilado=njit(cache=True)(_bucle)
+    return _bucle_compilado
+
+
+def _Trafico_numba(M, N, V_max, k, p, semilla, N1=100):
+    rng=np.random.default_rng(semilla)
+    X, V = condicion_inicial(M, k)
+    bucle=bucle_compilado()
+    vacio=np.empty((0,k),dtype=np.int64)
+
+    #Burn-in
+    if N1 == 'auto':
+        def avanzar():
+            bucle(X, V, M, V_max, p, rng, 1, vacio)
+            return V.sum()
+        quemado_adaptativo(avanzar, M, k)
+    else:
+        bucle(X, V, M, V_max, p, rng, N1, vacio)
+
+    #La simulacion real: N pasos
+    Pos=np.empty((N,k),dtype=np.int64)
+    bucle(X, V, M, V_max, p, rng, N, Pos)
+
+    return Pos
+
+
+def _Trafico_python(M, N, V_max, k, p, semilla, N1=100):
     seed(semilla)
-    
+
     #Set-up inicial
     X=np.linspace(0,M-1,k,dtype=int)
     V=np.zeros(k)
-    
-    #Burn-in: 100 pasos
-    N1=100
+
+    #Burn-in: N1 pasos
     for paso in range(N1):
         for i in range(k):
-            if V[i]+1<V_max:
+            if V[i]<V_max:
                 V[i]=V[i]+1
-    
-            d=(X[(i+1)%k]-X[i]+M)%M
+
+            d=(X[(i+1)%k]-X[i])%M
+            if k==1:
+                d=M
             if V[i]>=d:
                 V[i]=d-1
-    
-            p=randint(1,3)
-            if p==3:
-                V[i]=max(V[i]-1,0)
-    
+
+            if p!=0:
+                frena=random()
+                if frena<p:
+                    V[i]=max(V[i]-1,0)
+
         for i in range(k):
             X[i]=(X[i]+V[i])%M
-    
+
     #La simulacion real: N pasos
     Pos=np.zeros((N,X.size))
     j=0
     for paso in range(N):
         for i in range(k):
-            if V[i]+1<V_max:
+            if V[i]<V_max:
                 V[i]=V[i]+1
-    
-            d=(X[(i+1)%k]-X[i]+M)%M
+
+            d=(X[(i+1)%k]-X[i])%M
+            if k==1:
+                d=M
             if V[i]>=d:
                 V[i]=d-1
-    
-            p=randint(1,3)
-            if p==3:
-                V[i]=max(V[i]-1,0)
-    
+
+            if p!=0:
+                frena=random()
+                if frena<p:
+                    V[i]=max(V[i]-1,0)
+
         for i in range(k):
             X[i]=(X[i]+V[i])%M
-    
+
         # Guardo las posiciones
         Pos[j,:]=X
         j+=1
-    
+
     return Pos
+
+
+"""
+2)
+Ensamble de replicas: Nagel-Schreckenberg para R rutas independientes a la
+vez. Todas tienen el mismo largo M y se simulan los mismos N pasos, pero cada
+replica puede tener su propia cantidad de autos (y su V_max y su p). Los autos
+de todas las replicas van uno detras de otro en un solo array, y cada paso
+temporal es un unico juego de operaciones sobre ese array.
+
+Parametros:
+    M: cantidad de posiciones permitidas
+    N: total de pasos temporales
+    V_max: la velocidad maxima, un numero o uno por replica
+    K: cantidad de autos de cada replica (al menos 1), p. ej.
+        np.arange(10,1000,10)
+    p: probabilidad de frenado aleatorio, un numero o uno por replica
+    semilla: para inicializar el random gen. (uno solo para todas las
+        replicas: en cada paso se sortean todos los autos juntos)
+
+Devuelve un array con el flujo de cada replica: la distancia total recorrida
+por sus autos dividida por M*N.
+"""
+
+def Ensamble(M, N, V_max, K, p=0, semilla=None):
+    K=np.asarray(K,dtype=np.int64)
+    if (K<1).any():
+        raise ValueError("cada replica tiene que tener al menos un auto")
+    validar_p(p)
+    rng=uniformes(semilla, K.sum())
+    X, V, inicio = condicion_inicial_ensamble(M, K)
+
+    # Parametros de cada auto, segun la replica a la que pertenece
+    V_max=np.repeat(np.broadcast_to(V_max,K.shape),K)
+    p=np.repeat(np.broadcast_to(np.asarray(p,dtype=float),K.shape),K)
+    if not p.any():                     # Si nadie frena, no tiro numeros
+        p=None
+
+    #Burn-in: 100 pasos
+    N1=100
+    for _ in range(N1):
+        paso_ensamble(X, V, M, V_max, p, rng, inicio)
+
+    #La simulacion real: N pasos, sumando lo que avanza cada auto
+    Distancias=np.zeros(X.size,dtype=np.int64)
+    for _ in range(N):
+        paso_ensamble(X, V, M, V_max, p, rng, inicio)
+        Distancias+=V
+
+    return np.add.reduceat(Distancias,inicio[:-1])/(M*N)
+
+
+def condicion_inicial_ensamble(M, K):
+    """
+    Como condicion_inicial, pero con las replicas una detras de otra.
+    Devuelve X, V y los indices donde empieza cada replica (con uno extra al
+    final, el total de autos).
+    """
+    inicio=np.concatenate(([0],np.cumsum(K)))
+    X=np.concatenate([np.linspace(0,M-1,k,dtype=np.int64) for k in K])
+    V=np.zeros_like(X)
+    return X, V, inicio
+
+
+def distancias_ensamble(X, M, inicio):
+    """
+    Como distancias, replica por replica: el de adelante del ultimo auto de
+    cada replica es el primero de la misma replica.
+    """
+    d=np.empty_like(X)
+    d[:-1]=X[1:]-X[:-1]
+    ultimos=inicio[1:]-1
+    d[ultimos]=X[inicio[:-1]]-X[ultimos]
+    d%=M
+    d[d==0]=M                           # Un auto solo tiene toda la ruta
+    return d
+
+
+def paso_ensamble(X, V, M, V_max, p, rng, inicio):
+    """
+    Un paso temporal para todas las replicas a la vez. Igual que paso, con
+    V_max y p por auto (p=None si ninguno frena). Actualiza X y V en el lugar.
+    """
+    # Acelero
+    V+=1
+    np.minimum(V,V_max,out=V)
+
+    # Freno si choco con el de adelante
+    np.minimum(V,distancias_ensamble(X,M,inicio)-1,out=V)
+
+    # Frenado aleatorio con probabilidad p
+    if p is not None:
+        frena=rng.random(V.size)<p
+        V-=frena&(V>0)
+
+    # Muevo
+    X+=V
+    X%=M
+
+
+"""
+3)
+Mediciones sin guardar las trayectorias: la misma simulacion que Trafico,
+pero en vez de devolver el array de N x k posiciones va acumulando lo que
+avanza cada auto en cada paso. La memoria usada es O(k), sin importar N.
+
+Parametros: los mismos que Trafico (sin archivo ni delta); motor puede ser
+'auto', 'numpy' o 'red'.
+
+Con p=0 se detecta cuando la dinamica se vuelve periodica y el resto se
+calcula sin simular (ver medir), salvo que haya observador.
+
+Para corridas largas, con control='archivo.npz' cada `cada_control` pasos se
+guarda un punto de control (ver el modulo puntos_control) y si el archivo ya
+existe se sigue desde ahi: la corrida sigue exactamente igual que si no se
+hubiera cortado. Si se corta durante el burn-in, se vuelve a empezar. La
+semilla tiene que ser un entero o una SeedSequence, y un punto de control
+de otra corrida (otros parametros, semilla o N1) se rechaza.
+
+Devuelve un diccionario con:
+    flujo: distancia total recorrida / (M*N)
+    velocidad_media: distancia total recorrida / (k*N)
+    distancias: array con la distancia recorrida por cada auto
+    quemado: los pasos de burn-in que se hicieron (N1, o los que eligio
+        quemado_adaptativo con N1='auto')
+"""
+
+def Mediciones(M, N, V_max, k, p=0, semilla=None, motor='auto', N1=100,
+               perfil=None, observador=None, cada=1, control=None,
+               cada_control=10000):
+    validar_p(p)
+    if motor == 'auto':
+        motor=elegir_motor(M, k, V_max)
+    if motor == 'red':
+        return _Mediciones_red(M, N, V_max, k, p, semilla, N1, perfil,
+                               observador, cada, control, cada_control)
+    if motor != 'numpy':
+        raise ValueError("motor desconocido: {}".format(motor))
+
+    rng=uniformes(semilla, k)
+    X, V = condicion_inicial(M, k)
+    if perfil is None:
+        dar_paso=paso
+    else:
+        dar_paso=functools.partial(paso_perfilado, perfil=perfil)
+
+    #Burn-in, o lo que se llevaba hecho si hay punto de control
+    def avanzar():
+        dar_paso(X, V, M, V_max, p, rng)
+        return V.sum()
+    parametros=parametros_control(control, M, N, V_max, k, p, semilla, N1,
+                                  'numpy')
+    previo=seguir(control, parametros, rng, X, V)
+    if previo is None:
+        quemado=quemar(N1, avanzar, M, k)
+        desde, Distancias = 0, None
+    else:
+        quemado, desde, Distancias = previo
+
+    #La simulacion real: N pasos, sumando lo que avanza cada auto
+    def avanzar():
+        dar_paso(X, V, M, V_max, p, rng)
+        return slice(None), V
+    if observador is not None:
+        avanzar=observado(avanzar, observador, cada, lambda: (X, V), desde)
+    ciclo=p==0 and observador is None
+    if perfil is not None:
+        perfil.empezar()
+    Distancias=medir(N, k, avanzar,
+                     (lambda: huella(X, V, M)) if ciclo else None,
+                     controlador(control, cada_control, parametros, rng,
+                                 lambda: (X, V), quemado, N),
+                     desde, Distancias)
+    if perfil is not None:
+        perfil.terminar()
+
+    return resumen(Distancias, M, N, quemado)
+
+
+def _Mediciones_red(M, N, V_max, k, p, semilla, N1=100, perfil=None,
+                    observador=None, cada=1, control=None, cada_control=10000):
+    rng=uniformes(semilla, k)
+    X, V = condicion_inicial(M, k)
+    if perfil is None:
+        dar_paso=paso_red
+    else:
+        dar_paso=functools.partial(paso_red_perfilado, perfil=perfil)
+
+    #Burn-in, o lo que se llevaba hecho si hay punto de control
+    parametros=parametros_control(control, M, N, V_max, k, p, semilla, N1,
+                                  'red')
+    previo=seguir(control, parametros, rng, X, V)
+    ocupado, vel, auto = a_red(X, V, M, V_max)
+    def avanzar():
+        return dar_paso(ocupado, vel, auto, M, V_max, p, rng)[1].sum()
+    if previo is None:
+        quemado=quemar(N1, avanzar, M, k)
+        desde, Distancias = 0, None
+    else:
+        quemado, desde, Distancias = previo
+
+    #La simulacion real: N pasos, sumando lo que avanza cada auto
+    def avanzar():
+        return dar_paso(ocupado, vel, auto, M, V_max, p, rng)
+    def estado():
+        de_red(ocupado, vel, auto, X, V)
+        return X, V
+    def huella_red():
+        return huella(*estado(), M)
+    if observador is not None:
+        avanzar=observado(avanzar, observador, cada, estado, desde)
+    ciclo=p==0 and observador is None
+    if perfil is not None:
+        perfil.empezar()
+    Distancias=medir(N, k, avanzar, huella_red if ciclo else None,
+                     controlador(control, cada_control, parametros, rng,
+                                 estado, quemado, N),
+                     desde, Distancias)
+    if perfil is not None:
+        perfil.terminar()
+
+    return resumen(Distancias, M, N, quemado)
+
+
+def parametros_control(control, M, N, V_max, k, p, semilla, N1, motor):
+    """
+    Lo que identifica a una corrida en su punto de control: al seguir se
+    verifica que sea lo mismo. La semilla tiene que ser reproducible (un
+    entero o una SeedSequence, ver identificar_semilla).
+    """
+    if control is None:
+        return None
+    identidad=identificar_semilla(semilla)
+    if identidad is None:
+        raise ValueError("con control la semilla tiene que ser un entero o "
+                         "una SeedSequence, para poder seguir la corrida")
+    return [int(M), int(N), int(V_max), int(k), float(p), identidad,
+            N1 if N1 == 'auto' else int(N1), motor]
+
+
+def seguir(control, parametros, rng, X, V):
+    """
+    Si hay un punto de control en el archivo `control`, deja rng, X y V
+    como estaban y devuelve los pasos de burn-in, el paso en que iba y las
+    distancias acumuladas. Si no, None.
+    """
+    if control is None:
+        return None
+    previo=puntos_control.leer(control, parametros, rng)
+    if previo is None:
+        return None
+    X[:]=previo['X']
+    V[:]=previo['V']
+    return previo['quemado'], previo['t'], previo['distancias']
+
+
+def controlador(control, cada_control, parametros, rng, estado, quemado, N):
+    """
+    La funcion control(t, Distancias) de medir que guarda un punto de
+    control cada `cada_control` pasos y al final (None si no hay archivo).
+    """
+    if control is None:
+        return None
+    def guardar(t, Distancias):
+        if t%cada_control==0 or t==N:
+            X, V = estado()
+            puntos_control.guardar(control, parametros, rng, X=X, V=V, t=t,
+                                   quemado=quemado, distancias=Distancias)
+    return guardar
+
+
+def observado(avanzar, observador, cada, estado, desde=0):
+    """
+    Envuelve el avanzar() de medir para que cada `cada` pasos llame a
+    observador(t, X, V), con X y V los que devuelve estado(). Los pasos se
+    cuentan a partir de `desde` (el paso en que iba, si se sigue de un punto
+    de control).
+    """
+    t=desde
+    def avanzar_observado():
+        nonlocal t
+        resultado=avanzar()
+        t+=1
+        if t%cada==0:
+            observador(t, *estado())
+        return resultado
+    return avanzar_observado
+
+
+def resumen(Distancias, M, N, quemado):
+    """
+    Arma el diccionario de Mediciones a partir de la distancia de cada auto.
+    """
+    total=Distancias.sum()
+    return {'flujo': total/(M*N),
+            'velocidad_media': total/(Distancias.size*N),
+            'distancias': Distancias,
+            'quemado': quemado}
+
+
+"""
+4)
+Flujo con precision pedida: en vez de correr siempre N pasos, se corre hasta
+que el error estandar del flujo (por analisis de bloques de la serie de flujo
+paso a paso, ver el modulo estadistica) baja de `error`. Primero se alarga la
+corrida; si con N_max pasos no alcanza, se agregan replicas independientes
+hasta replicas_max.
+
+Parametros:
+    M, V_max, k, p, semilla, motor, N1: como en Mediciones (aca N1 es 'auto'
+        por defecto)
+    error: el error estandar buscado para el flujo
+    N_min: pasos con los que arranca cada replica
+    N_max: pasos maximos de cada replica
+    replicas_max: cantidad maxima de replicas
+
+Devuelve un diccionario con:
+    flujo: el flujo medio (pesado por los pasos de cada replica)
+    error: su error estandar
+    pasos: los pasos medidos en total, sumando las replicas
+    replicas: cuantas replicas se usaron
+    quemado: los pasos de burn-in, sumando las replicas
+"""
+
+def FlujoPreciso(M, V_max, k, p=0, semilla=None, error=1e-3, N_min=1000,
+                 N_max=100000, replicas_max=16, motor='auto', N1='auto'):
+    validar_p(p)
+    # Las replicas son hijas de la semilla. Una SeedSequence se copia, para
+    # no cambiarla al pedirle hijas; de un Generator se usa la suya, asi que
+    # cada llamada con el mismo Generator da replicas nuevas.
+    if isinstance(semilla, np.random.Generator):
+        semillas=semilla.bit_generator.seed_seq
+    elif isinstance(semilla, np.random.SeedSequence):
+        semillas=np.random.SeedSequence(semilla.entropy,
+                                        spawn_key=semilla.spawn_key)
+    else:
+        semillas=np.random.SeedSequence(semilla)
+    flujos, errores, pasos = [], [], []
+    quemado=0
+
+    while True:
+        rng=uniformes(semillas.spawn(1)[0], k)
+        avanzar=avanzador(M, V_max, k, p, rng, motor)
+        quemado+=quemar(N1, avanzar, M, k)
+
+        # Voy alargando la corrida hasta llegar al error o a N_max
+        serie=np.empty(N_max,dtype=np.int64)
+        N=0
+        objetivo=min(N_min,N_max)
+        while True:
+            for t in range(N,objetivo):
+                serie[t]=avanzar()
+            N=objetivo
+            flujo=serie[:N].mean()/M
+            error_flujo=error_bloques(serie[:N])/M
+            media, error_total = combinar(flujos+[flujo], errores+[error_flujo],
+                                          pasos+[N])
+            if error_total<=error or N==N_max:
+                break
+            # El error baja como 1/sqrt(N): estimo cuantos pasos faltan
+            faltan=int(N*(error_total/error)**2*1.1)
+            objetivo=min(N_max,max(faltan,N+N//4))
+
+        flujos.append(flujo)
+        errores.append(error_flujo)
+        pasos.append(N)
+        if error_total<=error or len(flujos)==replicas_max:
+            break
+
+    return {'flujo': float(media), 'error': float(error_total),
+            'pasos': sum(pasos),
+            'replicas': len(flujos), 'quemado': quemado}
+
+
+def avanzador(M, V_max, k, p, rng, motor='auto', inicial=None):
+    """
+    Arma la condicion inicial y devuelve una funcion que hace un paso
+    temporal y devuelve lo que avanzaron todos los autos en ese paso.
+    Con inicial=(X, V) (arrays de enteros de 64 bits, que se modifican)
+    arranca de ese estado en lugar de condicion_inicial. avanzar.estado()
+    devuelve el estado (X, V) en que quedo.
+    """
+    if motor == 'auto':
+        motor=elegir_motor(M, k, V_max)
+    X, V = condicion_inicial(M, k) if inicial is None else inicial
+
+    if motor == 'numpy':
+        def avanzar():
+            paso(X, V, M, V_max, p, rng)
+            return V.sum()
+        def estado():
+            return X, V
+    elif motor == 'red':
+        ocupado, vel, auto = a_red(X, V, M, V_max)
+        def avanzar():
+            return paso_red(ocupado, vel, auto, M, V_max, p, rng)[1].sum()
+        def estado():
+            de_red(ocupado, vel, auto, X, V)
+            return X, V
+    else:
+        raise ValueError("motor desconocido: {}".format(motor))
+
+    avanzar.estado=estado
+    return avanzar
+
+
+"""
+5)
+Continuacion en densidad: una serie de corridas con k autos que van
+cambiando (p. ej. K=range(10,1000,10)), donde cada una arranca del estado
+final de la anterior en lugar de autos equiespaciados y quietos. Los autos
+que faltan se agregan quietos en el medio de los huecos mas grandes y los
+que sobran se sacan de entre los que tienen mas espacio adelante, asi que
+los embotellamientos se mantienen. Como se arranca cerca del estado
+estacionario, el burn-in (por defecto adaptativo) es mucho mas corto.
+Recorriendo K para arriba y despues para abajo se ve si hay histeresis.
+
+Parametros:
+    M, N, V_max, p, N1: como en Mediciones (aca N1 es 'auto' por defecto)
+    K: la cantidad de autos de cada corrida (entre 1 y M), en el orden en
+        que se corren
+    semilla: cada corrida usa semilla_punto(semilla, k)
+    motor: 'auto', 'numpy' o 'red' (con 'auto' se elige en cada corrida)
+    inicial: un estado (X, V) de donde arrancar, p. ej. el 'estado' que
+        devolvio otra Continuacion; por defecto, condicion_inicial
+    ventana: la ventana minima de quemado_adaptativo con N1='auto'. Como
+        cada corrida arranca casi estacionaria, alcanza con una mas corta
+        que la de Mediciones (25 pasos), y el burn-in minimo baja de 100 a
+        4*ventana pasos (16 es lo minimo que admite el analisis de bloques).
+
+Devuelve un diccionario con arrays de una entrada por corrida:
+    k, densidad, flujo: los autos, k/M y la distancia total / (M*N)
+    quemado: los pasos de burn-in de cada corrida
+y en 'estado', el estado (X, V) al final de la ultima corrida.
+"""
+
+def Continuacion(M, N, V_max, K, p=0, semilla=None, N1='auto', motor='auto',
+                 inicial=None, ventana=16):
+    validar_p(p)
+    K=np.asarray(K,dtype=np.int64)
+    if ((K<1)|(K>M)).any():
+        raise ValueError("cada corrida tiene que tener entre 1 y M autos")
+    flujos=np.empty(K.size)
+    quemados=np.empty(K.size,dtype=np.int64)
+
+    if inicial is None:
+        X, V = condicion_inicial(M, K[0])
+    else:
+        X, V = (np.array(a,dtype=np.int64) for a in inicial)
+
+    for j, k in enumerate(K):
+        X, V = ajustar_autos(X, V, M, k)
+        rng=uniformes(semilla_punto(semilla, k), k)
+        avanzar=avanzador(M, V_max, k, p, rng, motor, inicial=(X, V))
+        quemados[j]=quemar(N1, avanzar, M, k, ventana)
+        flujos[j]=sum(avanzar() for _ in range(N))/(M*N)
+        X, V = avanzar.estado()
+
+    return {'k': K, 'densidad': K/M, 'flujo': flujos, 'quemado': quemados,
+            'estado': (X, V)}
+
+
+def ajustar_autos(X, V, M, k):
+    """
+    Lleva el estado (X, V) a k autos: agrega autos quietos en el medio de
+    los huecos mas grandes, o saca los autos con mas espacio adelante. Los
+    autos siguen en orden (el de adelante del i es el i+1). Devuelve los
+    nuevos X y V.
+    """
+    if k>M:
+        raise ValueError("no entran {} autos en {} posiciones".format(k, M))
+    while X.size<k:
+        d=distancias(X, M)
+        n=min(k-X.size, np.count_nonzero(d>=2))
+        i=np.sort(np.argsort(-d,kind='stable')[:n])
+        X=np.insert(X, i+1, (X[i]+d[i]//2)%M)
+        V=np.insert(V, i+1, 0)
+    if X.size>k:
+        i=np.argsort(-distancias(X, M),kind='stable')[:X.size-k]
+        X=np.delete(X, i)
+        V=np.delete(V, i)
+    return X, V
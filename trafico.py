@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Corre los barridos desde la linea de comandos, sin graficos ni ventanas,
+para usar en nodos de calculo. Para simular solo se importa numpy; scipy y
+matplotlib se importan recien en el subcomando informe.
+
+Ejemplos:
+    # Diagrama fundamental para V_max=1,2,3 y p=0.5, en 8 procesos
+    python trafico.py barrido --V_max 1 2 3 --k 10:1000:10 --p 0.5 \\
+        --procesos 8 --salida diagrama.csv
+
+    # El grafico (y los ajustes) a partir de los resultados
+    python trafico.py informe diagrama.csv --salida diagrama.png
+
+Con --salida .csv cada punto se agrega al archivo apenas termina; con .npz
+se guarda la tabla entera al final (una entrada por columna).
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from barrido import BarridoProgresivo, CAMPOS, DiagramaAdaptativo, registrar
+
+
+def enteros(texto):
+    """
+    Una lista de enteros: '10,20,50' o un rango 'desde:hasta:paso' (como
+    np.arange).
+    """
+    if ':' in texto:
+        return np.arange(*[int(x) for x in texto.split(':')]).tolist()
+    return [int(x) for x in texto.split(',')]
+
+
+def barrido(args):
+    """
+    Corre el barrido y guarda la tabla en args.salida.
+    """
+    if args.semilla is None:
+        args.semilla=int.from_bytes(os.urandom(3),'big')
+        print("semilla =", args.semilla, file=sys.stderr)
+
+    archivo_csv=args.salida if args.salida.endswith('.csv') else None
+    filas=[]
+    if args.adaptativo:
+        # Una curva por (V_max, p); cada una se guarda cuando termina
+        for V_max in args.V_max:
+            for p in args.p:
+                tabla=DiagramaAdaptativo(args.M, args.N, V_max, p,
+                                         args.semilla,
+                                         tolerancia=args.adaptativo,
+                                         procesos=args.procesos,
+                                         error=args.error, cache=args.cache,
+                                         motor=args.motor)
+                for fila in tabla:
+                    punto=tuple(fila[['M','N','V_max','k','p','semilla']]
+                                .tolist())
+                    resultado=tuple(fila[['flujo','error','pasos']].tolist())
+                    filas.append(registrar(punto, resultado, archivo_csv))
+    else:
+        k=[x for x in args.k if 0<x<args.M]
+        for fila in BarridoProgresivo(args.M, args.N, args.V_max, k, args.p,
+                                      args.semilla, procesos=args.procesos,
+                                      error=args.error, cache=args.cache,
+                                      archivo=archivo_csv, motor=args.motor):
+            filas.append(fila)
+            if not args.silencioso:
+                print("V_max={V_max} p={p} densidad={densidad:.4f} "
+                      "flujo={flujo:.5f}".format(**fila), file=sys.stderr)
+
+    if args.salida.endswith('.npz'):
+        filas.sort(key=lambda f: (f['V_max'], f['p'], f['k']))
+        np.savez(args.salida, **{c: np.array([f[c] for f in filas], dtype=t)
+                                 for c, t in CAMPOS})
+    return 0
+
+
+def leer(archivo):
+    """
+    Lee una tabla guardada por barrido (.csv o .npz) como array estructurado.
+    """
+    if archivo.endswith('.npz'):
+        with np.load(archivo) as datos:
+            tabla=np.zeros(len(datos['k']),dtype=CAMPOS)
+            for c, _ in CAMPOS:
+                tabla[c]=datos[c]
+        return tabla
+    return np.atleast_1d(np.genfromtxt(archivo, delimiter=',', names=True,
+                                       dtype=CAMPOS))
+
+
+def informe(args):
+    """
+    Grafica el diagrama fundamental de cada (V_max, p). Con p=0 ajusta las
+    dos rectas (antes y despues de 1/(V_max+1)) y con V_max=1 agrega la
+    solucion exacta.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot as plt
+    from scipy.optimize import curve_fit
+
+    def recta(x, a, b):
+        return a*x+b
+
+    tabla=leer(args.tabla)
+    fig, ax = plt.subplots()
+    for V_max in np.unique(tabla['V_max']):
+        for p in np.unique(tabla['p']):
+            curva=np.sort(tabla[(tabla['V_max']==V_max)&(tabla['p']==p)],
+                          order='densidad')
+            if curva.size==0:
+                continue
+            x, y = curva['densidad'], curva['flujo']
+            error=np.nan_to_num(curva['error'])
+            puntos=ax.errorbar(x, y, error, fmt='.',
+                               label="V_max = {}, p = {}".format(V_max, p))
+            color=puntos[0].get_color()
+
+            if V_max==1:
+                exacto=(1-np.sqrt(1-4*(1-p)*x*(1-x)))/2
+                ax.plot(x, exacto, '-', color=color, linewidth=0.75)
+                print("V_max=1 p={}: maxima diferencia con la solucion "
+                      "exacta {:.2e}".format(p, np.abs(y-exacto).max()))
+            elif p==0:
+                critica=1/(V_max+1)
+                for tramo in (x<=critica, x>=critica):
+                    if tramo.sum()<2:
+                        continue
+                    (a, b), _ = curve_fit(recta, x[tramo], y[tramo])
+                    ax.plot(x[tramo], recta(x[tramo], a, b), '-', color=color,
+                            linewidth=0.75)
+                    print("V_max={} p=0: f(x) = {:.3f}.x + {:.3f} en "
+                          "[{:.3f}, {:.3f}]".format(V_max, a, b,
+                                                    x[tramo].min(),
+                                                    x[tramo].max()))
+
+    ax.set_ylim(0)
+    ax.set_xlabel("Densidad")
+    ax.set_ylabel("Flujo")
+    ax.set_title("Diagrama fundamental")
+    ax.legend(fontsize=8)
+    fig.savefig(args.salida, dpi=200)
+    return 0
+
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    sub=parser.add_subparsers(dest='comando', required=True)
+
+    b=sub.add_parser('barrido', help='corre un barrido de parametros')
+    b.add_argument('--M', type=int, default=1000, help='largo de la ruta')
+    b.add_argument('--N', type=int, default=1000, help='pasos temporales')
+    b.add_argument('--V_max', type=int, nargs='+', default=[5])
+    b.add_argument('--k', type=enteros, default=enteros('10:1000:10'),
+                   help="autos: '10,20,50' o 'desde:hasta:paso'")
+    b.add_argument('--p', type=float, nargs='+', default=[0.5])
+    b.add_argument('--semilla', type=int,
+                   help='por defecto, una al azar (se muestra)')
+    b.add_argument('--motor', default='auto', choices=['auto','numpy','red'])
+    b.add_argument('--procesos', type=int,
+                   help='por defecto, uno por nucleo')
+    b.add_argument('--error', type=float,
+                   help='correr cada punto hasta este error en el flujo')
+    b.add_argument('--adaptativo', type=float, metavar='TOLERANCIA',
+                   help='elegir las densidades con DiagramaAdaptativo (se '
+                        'ignora --k)')
+    b.add_argument('--cache', help='carpeta para reusar resultados')
+    b.add_argument('--salida', default='barrido.csv', help='.csv o .npz')
+    b.add_argument('--silencioso', action='store_true')
+    b.set_defaults(funcion=barrido)
+
+    i=sub.add_parser('informe', help='grafica los resultados de un barrido')
+    i.add_argument('tabla', help='el .csv o .npz de barrido')
+    i.add_argument('--salida', default='diagrama.png')
+    i.set_defaults(funcion=informe)
+
+    args=parser.parse_args(argv)
+    if args.comando=='barrido' and not args.salida.endswith(('.csv','.npz')):
+        parser.error("--salida tiene que ser .csv o .npz")
+    return args.funcion(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
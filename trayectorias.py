@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+MODULO Trayectorias
+Guarda las trayectorias de una simulacion en disco, en el tipo entero mas
+chico que alcance (uint16 para las posiciones si M <= 65536, uint8 para las
+velocidades), escribiendo de a bloques mientras corre la simulacion. Se leen
+de vuelta con Trayectorias, que se puede indexar como el array Pos de
+simulacion.Trafico pero solo lee del disco las filas que se piden.
+
+Cada corrida es una carpeta con:
+    meta.json: M, N, k, V_max y el formato
+    posiciones.npy: las N x k posiciones (formato comun)
+    velocidades.npy: las N x k velocidades (opcional en el formato comun)
+    claves.npy: en el formato delta, las posiciones absolutas cada `bloque`
+        pasos
+
+En el formato delta no se guardan las posiciones sino lo que avanza cada auto
+en cada paso, que es su velocidad: entra en un uint8. Las posiciones se
+reconstruyen sumando desde la clave anterior.
+"""
+import json
+import os
+
+import numpy as np
+
+
+def tipo_minimo(maximo):
+    """
+    El tipo entero sin signo mas chico donde entra `maximo`.
+    """
+    return np.min_scalar_type(maximo)
+
+
+class Escritor:
+    """
+    Va guardando las posiciones (y velocidades) paso a paso en archivos .npy
+    mapeados en memoria. Junta `bloque` pasos en memoria antes de escribir.
+
+    Parametros:
+        archivo: carpeta donde se guarda la corrida
+        M, N, k, V_max: como en simulacion.Trafico
+        delta: si es True guarda las velocidades y una clave cada `bloque`
+            pasos en lugar de las posiciones
+        velocidades: en el formato comun, si tambien guarda las velocidades
+        bloque: cantidad de pasos que junta antes de escribir
+    """
+
+    def __init__(self, archivo, M, N, k, V_max, delta=False,
+                 velocidades=False, bloque=1024):
+        os.makedirs(archivo, exist_ok=True)
+        self.archivo=archivo
+        self.M, self.N, self.k = M, N, k
+        self.delta=delta
+        self.bloque=bloque
+        self.velocidades=velocidades or delta
+
+        tipo_X=tipo_minimo(M-1)
+        tipo_V=tipo_minimo(V_max)
+        abrir=np.lib.format.open_memmap
+        self._pos=None
+        self._claves=None
+        self._vel=None
+        if delta:
+            claves=(N+bloque-1)//bloque
+            self._claves=abrir(os.path.join(archivo,'claves.npy'), mode='w+',
+                               dtype=tipo_X, shape=(claves,k))
+        else:
+            self._pos=abrir(os.path.join(archivo,'posiciones.npy'), mode='w+',
+                            dtype=tipo_X, shape=(N,k))
+        if self.velocidades:
+            self._vel=abrir(os.path.join(archivo,'velocidades.npy'),
+                            mode='w+', dtype=tipo_V, shape=(N,k))
+
+        # Buffers de un bloque
+        self._buf_X=np.empty((bloque,k),dtype=tipo_X)
+        self._buf_V=np.empty((bloque,k),dtype=tipo_V)
+        self._j=0                       # Pasos en el buffer
+        self._t=0                       # Pasos ya escritos
+
+        with open(os.path.join(archivo,'meta.json'),'w') as f:
+            json.dump({'M': M, 'N': N, 'k': k, 'V_max': V_max, 'delta': delta,
+                       'velocidades': self.velocidades, 'bloque': bloque}, f)
+
+    def agregar(self, X, V):
+        """
+        Agrega un paso temporal: las posiciones X y velocidades V.
+        """
+        if self._t+self._j>=self.N:
+            raise ValueError("ya se guardaron los {} pasos".format(self.N))
+        if self.delta and self._j==0:
+            self._claves[self._t//self.bloque]=X
+        self._buf_X[self._j]=X
+        self._buf_V[self._j]=V
+        self._j+=1
+        if self._j==self.bloque:
+            self._escribir()
+
+    def _escribir(self):
+        t, j = self._t, self._j
+        if self._pos is not None:
+            self._pos[t:t+j]=self._buf_X[:j]
+        if self._vel is not None:
+            self._vel[t:t+j]=self._buf_V[:j]
+        self._t+=j
+        self._j=0
+
+    def cerrar(self):
+        """
+        Escribe lo que quede en el buffer y devuelve la corrida para leerla.
+        """
+        self._escribir()
+        for array in (self._pos, self._claves, self._vel):
+            if array is not None:
+                array.flush()
+        self._pos=self._claves=self._vel=None
+        return Trayectorias(self.archivo)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+
+class Trayectorias:
+    """
+    Una corrida guardada con Escritor. Se indexa como el array Pos de
+    simulacion.Trafico (tray[t], tray[a:b], tray[a:b, autos]) y devuelve
+    arrays de int64; solo se leen del disco las filas necesarias.
+
+    El atributo `velocidades` da las velocidades de la misma forma, si se
+    guardaron.
+    """
+
+    def __init__(self, archivo):
+        with open(os.path.join(archivo,'meta.json')) as f:
+            meta=json.load(f)
+        self.archivo=archivo
+        self.M=meta['M']
+        self.V_max=meta['V_max']
+        self.delta=meta['delta']
+        self.bloque=meta['bloque']
+        self.shape=(meta['N'],meta['k'])
+
+        def abrir(nombre):
+            return np.load(os.path.join(archivo,nombre), mmap_mode='r')
+
+        self._vel=abrir('velocidades.npy') if meta['velocidades'] else None
+        if self.delta:
+            self._claves=abrir('claves.npy')
+        else:
+            self._pos=abrir('posiciones.npy')
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def velocidades(self):
+        if self._vel is None:
+            return None
+        return _Vista(self._vel)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self[:], dtype=dtype)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, tuple):
+            filas, autos = indice[0], (Ellipsis,)+indice[1:]
+        else:
+            filas, autos = indice, (Ellipsis,)
+
+        if not self.delta:
+            return self._pos[filas][autos].astype(np.int64)
+
+        # Formato delta: sumo las velocidades desde la clave anterior
+        t=np.arange(self.shape[0])[filas]
+        if t.size==0:
+            return np.zeros((0,self.shape[1]),dtype=np.int64)[autos]
+        desde=(t.min()//self.bloque)*self.bloque
+        hasta=t.max()+1
+        tramo=np.array(self._vel[desde:hasta][autos],dtype=np.int64)
+        claves=self._claves[desde//self.bloque:(hasta-1)//self.bloque+1]
+
+        # Cada bloque empieza en su clave y de ahi sumo las velocidades
+        Pos=np.empty_like(tramo)
+        for c, a in enumerate(range(0,len(tramo),self.bloque)):
+            tramo[a]=claves[c][autos]
+            np.cumsum(tramo[a:a+self.bloque],axis=0,out=Pos[a:a+self.bloque])
+        Pos%=self.M
+        return Pos[t-desde]
+
+
+class _Vista:
+    """
+    Indexa un array guardado devolviendo int64.
+    """
+
+    def __init__(self, array):
+        self._array=array
+        self.shape=array.shape
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, indice):
+        return np.asarray(self._array[indice],dtype=np.int64)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self[:], dtype=dtype)